@@ -0,0 +1,88 @@
+"""Compares batch recipe conversion with converting each ingredient through a Pint quantity
+
+Recipes are built from the ingredient corpus in benchmark/data/ingredients.txt: one recipe with many ingredients and a
+batch of many recipes with a typical number of ingredients, converted to metric and US units with a scale factor.
+
+    python -m benchmark.bench_convert [--ingredients 500] [--recipes 1000] [--runs 20] [--output results.json]
+"""
+import argparse
+from itertools import cycle, islice
+from pint import UnitRegistry
+from benchmark.bench_ingredients import load_corpus
+from benchmark.common import measure, summarize, write_results
+from src.units import SYSTEM_UNITS, convert_recipes
+from src.util import parse_recipe_ingredients_batch
+
+def quantity_convert_recipes(recipes: list, ureg: UnitRegistry, system: str, scale: float) -> list:
+    """Converts every ingredient by building a Pint quantity and converting it to each unit of its dimension"""
+    ladders = [[ureg.Unit(unit) for unit, _ in ladder] for ladder in SYSTEM_UNITS[system]]
+    minimums = [[minimum for _, minimum in ladder] for ladder in SYSTEM_UNITS[system]]
+
+    result = []
+    for recipe in recipes:
+        ingredients = []
+        for ingredient in recipe["ingredients"]:
+            quantity, unit = ingredient["quantity"] * scale, ingredient["unit"]
+            if unit:
+                value = ureg.Quantity(quantity, unit)
+                for ladder, ladder_minimums in zip(ladders, minimums):
+                    if value.dimensionality == ladder[0].dimensionality:
+                        for target, minimum in reversed(list(zip(ladder, ladder_minimums))):
+                            converted = value.to(target)
+                            if converted.magnitude >= minimum:
+                                quantity, unit = converted.magnitude, str(target)
+                                break
+                        break
+
+            ingredients.append({ "raw": ingredient["raw"], "quantity": round(quantity, 2), "unit": unit })
+
+        result.append({ **recipe, "ingredients": ingredients })
+
+    return result
+
+def create_recipes(count: int, ingredients: int, ureg: UnitRegistry) -> list:
+    """Builds parsed recipes from the ingredient corpus
+
+    Args:
+        count (int): recipes to build
+        ingredients (int): ingredients per recipe
+        ureg (UnitRegistry): registry to parse the ingredients with
+
+    Returns:
+        list: recipes with title and parsed ingredients
+    """
+    lines = cycle(parse_recipe_ingredients_batch(load_corpus(ingredients * min(count, 10)), "en", ureg))
+    return [{ "title": f"Recipe {index}", "ingredients": list(islice(lines, ingredients)) } for index in range(count)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ingredients", type=int, default=500, help="ingredients of the single large recipe")
+    parser.add_argument("--recipes", type=int, default=1000, help="recipes in the batch")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    ureg = UnitRegistry()
+    inputs = {
+        "large_recipe": create_recipes(1, args.ingredients, ureg),
+        "recipe_batch": create_recipes(args.recipes, 12, ureg),
+    }
+
+    results = {}
+    for name, recipes in inputs.items():
+        for system in SYSTEM_UNITS:
+            batch = convert_recipes(recipes, ureg, system, 2)
+            quantity = quantity_convert_recipes(recipes, ureg, system, 2)
+            entry = {
+                "ingredients": sum(len(recipe["ingredients"]) for recipe in recipes),
+                "changed_results": sum(1 for old, new in zip(quantity, batch) if old != new),
+                "quantity": summarize(measure(lambda: quantity_convert_recipes(recipes, ureg, system, 2), args.runs)),
+                "batch": summarize(measure(lambda: convert_recipes(recipes, ureg, system, 2), args.runs)),
+            }
+            entry["batch_speedup"] = round(entry["quantity"]["p50_ms"] / entry["batch"]["p50_ms"], 2)
+            results[f"{name}_{system}"] = entry
+
+    write_results("recipe_convert", results, args.output)
+
+if __name__ == "__main__":
+    main()
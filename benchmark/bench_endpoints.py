@@ -0,0 +1,236 @@
+"""Measures latency, throughput and peak memory of /recipe/parse, /recipe/backup/parse and /image/process offline
+
+Recipe pages saved in benchmark/data/pages are served by a local stand-in server together with a photo for
+downloadImage. Backups are synthetic zips with the requested recipe and image count. Photos are the JPEGs passed with
+--photos, or the test image and synthetic 12 MP and 24 MP photos by default. Each endpoint runs in its own process
+with caches disabled so every request does the full work and peak RSS is not shared between endpoints.
+
+    python -m benchmark.bench_endpoints [--runs 20] [--recipes 50] [--images 10] [--image-size 4000x3000]
+                                        [--photos folder] [--endpoint parse] [--output results.json]
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from itertools import cycle, islice
+from time import perf_counter
+from zipfile import ZipFile
+from benchmark.bench_image import create_photo
+from benchmark.common import measure, peak_rss_mb, summarize, write_results
+
+ENDPOINTS = ["parse", "parse_image", "backup", "image"]
+PAGES = os.path.join(os.path.dirname(__file__), "data", "pages")
+INGREDIENTS = os.path.join(os.path.dirname(__file__), "data", "ingredients.txt")
+INSTRUCTIONS = os.path.join(os.path.dirname(__file__), "data", "instructions.txt")
+
+class PageHandler(SimpleHTTPRequestHandler):
+    """Serves the saved pages with {{base_url}} replaced by the address of the server"""
+
+    def do_GET(self):
+        path = self.translate_path(self.path)
+        if not path.endswith(".html"):
+            return super().do_GET()
+
+        try:
+            with open(path, encoding="utf-8") as file:
+                body = file.read().replace("{{base_url}}", f"http://{self.headers['Host']}").encode()
+        except OSError:
+            return self.send_error(404)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_server(folder: str) -> ThreadingHTTPServer:
+    """Starts the stand-in recipe website on a free local port
+
+    Args:
+        folder (str): folder with the pages and photo to serve
+
+    Returns:
+        ThreadingHTTPServer: running server, call shutdown when done
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(PageHandler, directory=folder))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def read_lines(path: str) -> list:
+    with open(path, encoding="utf-8") as file:
+        return [line.strip() for line in file if line.strip()]
+
+def create_backup(path: str, recipes: int, images: int, image_size: tuple):
+    """Writes a synthetic Sharp Cooking backup
+
+    Recipes take ingredients and instructions from the benchmark corpora and share the images round robin.
+
+    Args:
+        path (str): zip file to write
+        recipes (int): recipes in the backup
+        images (int): distinct images in the backup
+        image_size (tuple): width and height of the images
+    """
+    ingredients = cycle(read_lines(INGREDIENTS))
+    instructions = cycle(read_lines(INSTRUCTIONS))
+    with tempfile.TemporaryDirectory() as directory, ZipFile(path, "w") as zip:
+        names = []
+        for index in range(images):
+            name = f"image{index}.jpeg"
+            create_photo(os.path.join(directory, name), image_size)
+            zip.write(os.path.join(directory, name), name)
+            names.append(name)
+
+        backup = [{
+            "Id": index + 1,
+            "Title": f"Recipe {index + 1}",
+            "MainImagePath": names[index % len(names)],
+            "Ingredients": "\n".join(islice(ingredients, 10)),
+            "Instructions": "\n\n".join(islice(instructions, 6)),
+            "Notes": None
+        } for index in range(recipes)]
+        zip.writestr("SharpBackup_Recipe.json", json.dumps(backup))
+
+def create_photos(folder: str) -> list:
+    """Writes the default photo set
+
+    Args:
+        folder (str): folder to write the synthetic photos to
+
+    Returns:
+        list: paths of the test image and the synthetic 12 MP and 24 MP photos
+    """
+    photos = [os.path.join("test", "test_image.jpeg")]
+    for name, size in [("photo_12mp.jpeg", (4000, 3000)), ("photo_24mp.jpeg", (6000, 4000))]:
+        photos.append(os.path.join(folder, name))
+        create_photo(photos[-1], size)
+
+    return photos
+
+def summarize_requests(samples: list, items: int = 1) -> dict:
+    """Summarizes request latencies with throughput
+
+    Args:
+        samples (list): latency of each request in seconds
+        items (int): items handled by each request, e.g. recipes in a backup
+
+    Returns:
+        dictionary: latency summary with requests and items per second
+    """
+    result = summarize(samples)
+    result["requests_per_second"] = round(len(samples) / sum(samples), 2)
+    if items > 1:
+        result["items_per_second"] = round(len(samples) * items / sum(samples), 2)
+
+    return result
+
+def run_endpoint(endpoint: str, folder: str, runs: int) -> dict:
+    """Benchmarks an endpoint in the current process
+
+    Args:
+        endpoint (str): one of ENDPOINTS
+        folder (str): folder with the served site, backup.zip and the photos
+        runs (int): timed requests per input
+
+    Returns:
+        dictionary: latency and throughput summary per input with the peak RSS of the process
+    """
+    from fastapi.testclient import TestClient
+    from src.main import app
+
+    client = TestClient(app)
+    results = {}
+
+    def post(url: str, expected: int = 200, **options):
+        response = client.post(url, **options)
+        assert response.status_code == expected, response.text
+
+    if endpoint in ("parse", "parse_image"):
+        server = start_server(os.path.join(folder, "site"))
+        try:
+            base_url = f"http://127.0.0.1:{server.server_address[1]}"
+            for page in sorted(glob.glob(os.path.join(folder, "site", "*.html"))):
+                request = { "url": f"{base_url}/{os.path.basename(page)}", "downloadImage": endpoint == "parse_image" }
+                samples = measure(lambda: post("/recipe/parse", json=request), runs)
+                results[os.path.basename(page)] = summarize_requests(samples)
+        finally:
+            server.shutdown()
+
+    if endpoint == "backup":
+        with open(os.path.join(folder, "backup.zip"), "rb") as file:
+            backup = file.read()
+
+        with ZipFile(os.path.join(folder, "backup.zip")) as zip:
+            recipes = len(json.loads(zip.read("SharpBackup_Recipe.json")))
+
+        for stream in (False, True):
+            samples = measure(lambda: post("/recipe/backup/parse", params={ "stream": stream },
+                                           files={ "file": ("backup.zip", backup, "application/zip") }), runs)
+            results["stream" if stream else "list"] = summarize_requests(samples, recipes)
+
+    if endpoint == "image":
+        for photo in sorted(glob.glob(os.path.join(folder, "photos", "*"))):
+            with open(photo, "rb") as file:
+                image = file.read()
+
+            samples = measure(lambda: post("/image/process", files={ "file": ("photo.jpeg", image, "image/jpeg") }), runs)
+            results[os.path.basename(photo)] = { "bytes": len(image), **summarize_requests(samples) }
+
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--recipes", type=int, default=50, help="recipes in the synthetic backup")
+    parser.add_argument("--images", type=int, default=10, help="distinct images in the synthetic backup")
+    parser.add_argument("--image-size", default="4000x3000", help="size of the backup images")
+    parser.add_argument("--photos", help="folder of JPEGs posted to /image/process")
+    parser.add_argument("--endpoint", choices=ENDPOINTS, action="append", help="endpoints to run, all by default")
+    parser.add_argument("--output")
+    parser.add_argument("--folder", help=argparse.SUPPRESS)
+    parser.add_argument("--child", choices=ENDPOINTS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_endpoint(args.child, args.folder, args.runs)))
+        return
+
+    image_size = tuple(int(value) for value in args.image_size.split("x"))
+    with tempfile.TemporaryDirectory() as folder:
+        start = perf_counter()
+        shutil.copytree(PAGES, os.path.join(folder, "site"))
+        create_photo(os.path.join(folder, "site", "photo.jpeg"), (1600, 1200))
+        create_backup(os.path.join(folder, "backup.zip"), args.recipes, args.images, image_size)
+
+        os.makedirs(os.path.join(folder, "photos"))
+        photos = glob.glob(os.path.join(args.photos, "*.jp*g")) if args.photos else create_photos(folder)
+        for photo in photos:
+            shutil.copy(photo, os.path.join(folder, "photos"))
+
+        results = {
+            "setup_seconds": round(perf_counter() - start, 2),
+            "backup": { "recipes": args.recipes, "images": args.images, "image_size": image_size,
+                        "bytes": os.path.getsize(os.path.join(folder, "backup.zip")) },
+        }
+        environment = { **os.environ, "RECIPE_CACHE_BACKEND": "none", "IMAGE_CACHE_BACKEND": "none" }
+        for endpoint in args.endpoint or ENDPOINTS:
+            output = subprocess.run([sys.executable, "-m", "benchmark.bench_endpoints", "--child", endpoint,
+                                     "--folder", folder, "--runs", str(args.runs)],
+                                    env=environment, check=True, capture_output=True, text=True).stdout
+            results[endpoint] = json.loads(output.strip().splitlines()[-1])
+
+    write_results("endpoints", results, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Compares parse_image resize modes on a large JPEG
+
+Each mode runs in its own process so peak RSS is not shared between modes. The balanced mode is the behavior of
+parse_image before resize modes were introduced.
+
+    python -m benchmark.bench_image [--image photo.jpeg] [--runs 10] [--output results.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from PIL import Image
+from benchmark.common import measure, peak_rss_mb, summarize, write_results
+
+MODES = ["fast", "balanced", "quality"]
+
+def create_photo(path: str, size: tuple = (6000, 4000)):
+    """Writes a synthetic photo sized like a 24 MP phone camera JPEG
+
+    Args:
+        path (str): file to write
+        size (tuple): width and height
+    """
+    red = Image.linear_gradient("L").resize(size)
+    green = Image.effect_noise(size, 40)
+    blue = Image.radial_gradient("L").resize(size)
+    Image.merge("RGB", (red, green, blue)).save(path, format="jpeg", quality=90)
+
+def run_mode(image_path: str, mode: str, runs: int) -> dict:
+    """Benchmarks a resize mode in the current process
+
+    Args:
+        image_path (str): JPEG to resize
+        mode (str): resize mode
+        runs (int): timed runs
+
+    Returns:
+        dictionary: latency summary and peak RSS growth in megabytes
+    """
+    from src.util import parse_image
+
+    with open(image_path, "rb") as file:
+        image = file.read()
+
+    baseline = peak_rss_mb()
+    result = summarize(measure(lambda: parse_image(os.path.basename(image_path), image, True, mode), runs))
+    result["peak_rss_growth_mb"] = round(peak_rss_mb() - baseline, 1)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--image", help="JPEG to resize, a synthetic 24 MP photo by default")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--output")
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.image, args.mode, args.runs)))
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        image_path = args.image
+        if not image_path:
+            image_path = os.path.join(directory, "photo.jpeg")
+            create_photo(image_path)
+
+        results = { "image": { "bytes": os.path.getsize(image_path), "size": Image.open(image_path).size } }
+        for mode in MODES:
+            output = subprocess.run([sys.executable, "-m", "benchmark.bench_image", "--mode", mode, "--image", image_path,
+                                     "--runs", str(args.runs)], check=True, capture_output=True, text=True).stdout
+            results[mode] = json.loads(output)
+
+    write_results("image_resize", results, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Compares the batch ingredient parser with the per line parser it replaced
+
+The corpus in benchmark/data/ingredients.txt is repeated until it has the requested number of lines.
+
+    python -m benchmark.bench_ingredients [--lines 5000] [--runs 20] [--output results.json]
+"""
+import argparse
+import os
+import re
+from fractions import Fraction
+from itertools import cycle, islice
+from pint import UnitRegistry
+from benchmark.common import measure, summarize, write_results
+from src.util import parse_recipe_ingredient, parse_recipe_ingredients_batch
+
+CORPUS = os.path.join(os.path.dirname(__file__), "data", "ingredients.txt")
+
+def legacy_replace_unicode_fractions(text: str):
+    result = text.replace("½", "1/2")
+    result = result.replace("¼", "1/4")
+    result = result.replace("¾", "3/4")
+    result = result.replace("⅓", "1/3")
+    result = result.replace("⅔", "2/3")
+
+    return result
+
+def legacy_parse_recipe_ingredient(text: str, lang: str, ureg: UnitRegistry):
+    text = legacy_replace_unicode_fractions(text)
+    qty_re = re.search(r"^(?P<Value>\d{1,5}\s\d{1,5}\/\d{1,5}|\d{1,5}\/\d{1,5}|\d{1,5}\.?\d{0,5})\d*\s?(?P<Unit>\w*\b)",
+                    text)
+
+    if not qty_re:
+        return { "raw": text, "quantity": 0, "unit": "" }
+
+    value = qty_re.group("Value")
+    unit = qty_re.group("Unit")
+    
+    unit_value = ""
+    if unit and unit in ureg:
+        unit_value = ureg.get_name(unit)
+
+    parts = value.split(" ")
+    
+    if parts.__len__() == 2:
+        whole = int(parts[0])
+        fraction = Fraction(parts[1])
+        return { "raw": text, "quantity": whole + float(fraction).__round__(2), "unit": unit_value }
+    
+    if parts[0].count("/") == 1:
+        fraction = Fraction(parts[0])
+        return { "raw": text, "quantity": float(fraction).__round__(2), "unit": unit_value }
+        
+    regular = parts[0]
+    return { "raw": text, "quantity": float(regular), "unit": unit_value }
+
+def load_corpus(lines: int) -> list:
+    """Loads the ingredient corpus repeated up to lines
+
+    Args:
+        lines (int): number of lines
+
+    Returns:
+        list: ingredient lines
+    """
+    with open(CORPUS, encoding="utf-8") as file:
+        corpus = [line.strip() for line in file if line.strip()]
+
+    return list(islice(cycle(corpus), lines))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=5000)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    lines = load_corpus(args.lines)
+    ureg = UnitRegistry()
+
+    legacy = [legacy_parse_recipe_ingredient(line, "en", ureg) for line in lines]
+    batch = parse_recipe_ingredients_batch(lines, "en", ureg)
+    changed = sum(1 for old, new in zip(legacy, batch) if old != new)
+
+    results = {
+        "lines": len(lines),
+        "changed_results": changed,
+        "legacy": summarize(measure(lambda: [legacy_parse_recipe_ingredient(line, "en", ureg) for line in lines], args.runs)),
+        "per_line": summarize(measure(lambda: [parse_recipe_ingredient(line, "en", ureg) for line in lines], args.runs)),
+        "batch": summarize(measure(lambda: parse_recipe_ingredients_batch(lines, "en", ureg), args.runs)),
+    }
+    results["batch_speedup"] = round(results["legacy"]["p50_ms"] / results["batch"]["p50_ms"], 2)
+
+    write_results("ingredient_parse", results, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Compares the batch instruction parser with the per line parser it replaced
+
+The corpus in benchmark/data/instructions.txt is repeated until it has the requested number of lines.
+
+    python -m benchmark.bench_instructions [--lines 5000] [--runs 20] [--output results.json]
+"""
+import argparse
+import os
+import re
+from itertools import cycle, islice
+from benchmark.common import measure, summarize, write_results
+from src.util import parse_recipe_instruction, parse_recipe_instructions_batch
+
+CORPUS = os.path.join(os.path.dirname(__file__), "data", "instructions.txt")
+
+def legacy_parse_recipe_instruction(text: str, lang: str):
+    qty_re = re.findall(r"(?P<Minutes>\d{1,5}\.?\d{0,5})\s*(minutes|minute|min)\b|(?P<Hours>\d{1,5}\.?\d{0,5})\s*(hours|hour)\b|(?P<Days>\d{1,5}\.?\d{0,5})\s*(days|day)\b",
+                    text)
+    minutes = 0
+    
+    for match in qty_re:
+        minutes += float(match[0] or "0")
+        minutes += float(match[2] or "0") * 60
+        minutes += float(match[4] or "0") * 24 * 60
+    
+    return { "raw": text, "minutes": minutes }
+
+def load_corpus(lines: int) -> list:
+    """Loads the instruction corpus repeated up to lines
+
+    Args:
+        lines (int): number of lines
+
+    Returns:
+        list: instruction lines
+    """
+    with open(CORPUS, encoding="utf-8") as file:
+        corpus = [line.strip() for line in file if line.strip()]
+
+    return list(islice(cycle(corpus), lines))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=5000)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    lines = load_corpus(args.lines)
+
+    legacy = [legacy_parse_recipe_instruction(line, "en") for line in lines]
+    batch = parse_recipe_instructions_batch(lines, "en")
+
+    results = {
+        "lines": len(lines),
+        "changed_results": sum(1 for old, new in zip(legacy, batch) if old != new),
+        "legacy_timed_lines": sum(1 for result in legacy if result["minutes"]),
+        "batch_timed_lines": sum(1 for result in batch if result["minutes"]),
+        "legacy": summarize(measure(lambda: [legacy_parse_recipe_instruction(line, "en") for line in lines], args.runs)),
+        "per_line": summarize(measure(lambda: [parse_recipe_instruction(line, "en") for line in lines], args.runs)),
+        "batch": summarize(measure(lambda: parse_recipe_instructions_batch(lines, "en"), args.runs)),
+    }
+    results["batch_speedup"] = round(results["legacy"]["p50_ms"] / results["batch"]["p50_ms"], 2)
+
+    write_results("instruction_parse", results, args.output)
+
+if __name__ == "__main__":
+    main()
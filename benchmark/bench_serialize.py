@@ -0,0 +1,105 @@
+"""Compares serializing a large backup response through the response model with FastJSONResponse
+
+The recipes are built like /recipe/backup/parse results, with ingredients and instructions from the benchmark corpora
+and a base64 data URI image each. Both paths are served by FastAPI endpoints returning the same list: one through
+response_model validation and the standard json encoder, the other returning FastJSONResponse. Peak memory allocated
+while answering is traced once per path.
+
+    python -m benchmark.bench_serialize [--recipes 1000] [--image-bytes 20000] [--runs 20] [--output results.json]
+"""
+import argparse
+import base64
+import os
+import tracemalloc
+from itertools import cycle, islice
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from benchmark.bench_endpoints import INGREDIENTS, INSTRUCTIONS, read_lines
+from benchmark.common import measure, summarize, write_results
+from src.models import Recipe
+from src.responses import FastJSONResponse, orjson
+from src.units import get_unit_registry
+from src.util import parse_recipe_ingredients, parse_recipe_instructions
+
+def create_recipes(count: int, image_bytes: int) -> list:
+    """Builds parsed backup recipes
+
+    Args:
+        count (int): recipes to build
+        image_bytes (int): size of the image of each recipe before base64 encoding
+
+    Returns:
+        list: recipes in new json format
+    """
+    ingredients = cycle(read_lines(INGREDIENTS))
+    instructions = cycle(read_lines(INSTRUCTIONS))
+    image = "data:image/jpeg;base64," + base64.b64encode(os.urandom(image_bytes)).decode()
+    return [{
+        "title": f"Recipe {index}",
+        "totalTime": 0,
+        "yields": "",
+        "ingredients": parse_recipe_ingredients("\n".join(islice(ingredients, 10)), get_unit_registry()),
+        "steps": parse_recipe_instructions("\n\n".join(islice(instructions, 6))),
+        "image": image,
+        "host": "",
+        "notes": None,
+        "fingerprint": f"{index:064x}"
+    } for index in range(count)]
+
+def create_app(recipes: list) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/validated", response_model=list[Recipe])
+    def validated():
+        return recipes
+
+    @app.get("/fast", response_model=list[Recipe])
+    def fast():
+        return FastJSONResponse(recipes)
+
+    return app
+
+def traced_peak_mb(fn) -> float:
+    """Peak memory allocated by fn as traced by tracemalloc
+
+    Args:
+        fn (Callable): function to trace, called without arguments
+
+    Returns:
+        float: peak allocated megabytes
+    """
+    tracemalloc.start()
+    try:
+        fn()
+        return round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+    finally:
+        tracemalloc.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipes", type=int, default=1000)
+    parser.add_argument("--image-bytes", type=int, default=20000, help="image size of each recipe before base64")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    recipes = create_recipes(args.recipes, args.image_bytes)
+    client = TestClient(create_app(recipes))
+
+    validated, fast = client.get("/validated"), client.get("/fast")
+    results = {
+        "recipes": args.recipes,
+        "response_bytes": len(fast.content),
+        "encoder": "orjson" if orjson is not None else "json",
+        "same_results": validated.json() == fast.json(),
+    }
+    for path in ("validated", "fast"):
+        results[path] = summarize(measure(lambda: client.get(f"/{path}"), args.runs))
+        results[path]["peak_traced_mb"] = traced_peak_mb(lambda: client.get(f"/{path}"))
+
+    results["fast_speedup"] = round(results["validated"]["p50_ms"] / results["fast"]["p50_ms"], 2)
+
+    write_results("response_serialize", results, args.output)
+
+if __name__ == "__main__":
+    main()
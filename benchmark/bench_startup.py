@@ -0,0 +1,68 @@
+"""Measures worker cold start: importing src.main and serving the first request that needs units
+
+Every run starts a fresh interpreter. Configurations cover the full Pint registry, the full registry loaded from
+Pint's definitions cache and the cooking units subset.
+
+    python -m benchmark.bench_startup [--runs 5] [--output results.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from benchmark.common import summarize, write_results
+
+CHILD = """
+import json
+from time import perf_counter
+start = perf_counter()
+from src.main import app
+imported = perf_counter()
+from fastapi.testclient import TestClient
+client = TestClient(app)
+with open("test/test_backup.zip", "rb") as file:
+    ready = perf_counter()
+    response = client.post("/recipe/backup/parse", files={"file": ("backup.zip", file, "application/zip")})
+done = perf_counter()
+assert response.status_code == 200
+print(json.dumps({ "import": imported - start, "first_request": done - ready, "total": imported - start + done - ready }))
+"""
+
+def run_child(environment: dict) -> dict:
+    """Starts an interpreter that imports the app and serves one backup request
+
+    Args:
+        environment (dict): environment variables added for the run
+
+    Returns:
+        dictionary: import, first request and total time in seconds
+    """
+    output = subprocess.run([sys.executable, "-c", CHILD], env={ **os.environ, **environment }, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_folder:
+        configurations = {
+            "full": { "UNIT_REGISTRY_UNITS": "full" },
+            "full_cached": { "UNIT_REGISTRY_UNITS": "full", "UNIT_REGISTRY_CACHE": cache_folder },
+            "cooking": { "UNIT_REGISTRY_UNITS": "cooking" },
+        }
+        # fills the definitions cache so full_cached measures warm starts
+        run_child(configurations["full_cached"])
+
+        results = {}
+        for name, environment in configurations.items():
+            runs = [run_child(environment) for _ in range(args.runs)]
+            results[name] = { stage: summarize([run[stage] for run in runs]) for stage in ["import", "first_request", "total"] }
+
+    write_results("startup", results, args.output)
+
+if __name__ == "__main__":
+    main()
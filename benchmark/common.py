@@ -0,0 +1,93 @@
+import json
+import os
+import resource
+import sys
+from statistics import mean
+from time import perf_counter
+from typing import Callable, Union
+
+def percentile(samples: list, percent: float) -> float:
+    """Nearest rank percentile of samples
+
+    Args:
+        samples (list): measured values
+        percent (float): percentile between 0 and 100
+
+    Returns:
+        float: the percentile value
+    """
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+def summarize(samples: list) -> dict:
+    """Summarizes latency samples
+
+    Args:
+        samples (list): latencies in seconds
+
+    Returns:
+        dictionary: runs, mean, p50, p99 and min latency in milliseconds
+    """
+    return {
+        "runs": len(samples),
+        "mean_ms": round(mean(samples) * 1000, 3),
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+        "min_ms": round(min(samples) * 1000, 3)
+    }
+
+def measure(fn: Callable, runs: int, warmup: int = 1) -> list:
+    """Times calls to fn
+
+    Args:
+        fn (Callable): function to time, called without arguments
+        runs (int): timed calls
+        warmup (int): untimed calls made first
+
+    Returns:
+        list: latency of each timed call in seconds
+    """
+    for _ in range(warmup):
+        fn()
+
+    samples = []
+    for _ in range(runs):
+        start = perf_counter()
+        fn()
+        samples.append(perf_counter() - start)
+
+    return samples
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of the current process
+
+    On Linux the high water mark of /proc/self/status is used since ru_maxrss carries the peak of the parent
+    process over exec.
+
+    Returns:
+        float: peak RSS in megabytes
+    """
+    if os.path.exists("/proc/self/status"):
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def write_results(name: str, results: dict, output: Union[str, None] = None):
+    """Writes benchmark results as json to a file or stdout
+
+    Args:
+        name (str): benchmark name
+        results (dict): benchmark results
+        output (str): file to write to, stdout when None
+    """
+    content = json.dumps({ "benchmark": name, "python": sys.version.split()[0], "results": results }, indent=2)
+    if output:
+        with open(output, "w") as file:
+            file.write(content + "\n")
+    else:
+        print(content)
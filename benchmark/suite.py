@@ -0,0 +1,45 @@
+"""Runs every benchmark and writes their results to a single json file so runs can be compared
+
+Endpoint benchmarks are followed by the micro-benchmarks of parse_recipe_ingredient, parse_recipe_instruction,
+convert_recipes, response serialization and parse_image and by the startup benchmark. Options after -- are passed to
+every benchmark.
+
+    python -m benchmark.suite [--skip startup] [--output results.json] [-- --runs 5]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from benchmark.common import write_results
+
+BENCHMARKS = ["bench_endpoints", "bench_ingredients", "bench_instructions", "bench_convert", "bench_serialize", "bench_image",
+              "bench_startup"]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--skip", choices=BENCHMARKS + [name.replace("bench_", "") for name in BENCHMARKS],
+                        action="append", default=[], help="benchmarks not to run")
+    parser.add_argument("--output")
+    parser.add_argument("options", nargs=argparse.REMAINDER, help="options passed to every benchmark after --")
+    args = parser.parse_args()
+
+    options = args.options[1:] if args.options[:1] == ["--"] else args.options
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name in BENCHMARKS:
+            if name in args.skip or name.replace("bench_", "") in args.skip:
+                continue
+
+            output = os.path.join(directory, name + ".json")
+            subprocess.run([sys.executable, "-m", f"benchmark.{name}", "--output", output, *options], check=True)
+            with open(output) as file:
+                content = json.load(file)
+
+            results[content["benchmark"]] = content["results"]
+
+    write_results("suite", results, args.output)
+
+if __name__ == "__main__":
+    main()
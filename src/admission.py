@@ -0,0 +1,167 @@
+import asyncio
+import os
+from collections import deque
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+from src.metrics import admission_active, admission_queue_depth, admission_rejected
+
+class AdmissionLimit:
+    """Concurrency limit of an endpoint with a bounded queue of requests waiting for a slot
+
+    Slots are handed to waiting requests in arrival order. A request is rejected when the queue is full or it waited
+    longer than the timeout, so a burst of heavy requests cannot pile up work and memory without bounds.
+
+    Args:
+        name (str): endpoint label of the admission metrics
+        concurrency (int): requests processed at the same time, 0 for no limit
+        queue_size (int): requests waiting for a slot before new ones are rejected
+        timeout (float): seconds a request waits for a slot, 0 to wait until one is free
+        max_bytes (int): largest request body, 0 for no limit
+        retry_after (int): seconds sent in Retry-After when a request is rejected
+    """
+
+    def __init__(self, name: str, concurrency: int, queue_size: int = 0, timeout: float = 0, max_bytes: int = 0,
+                 retry_after: int = 1):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.retry_after = retry_after
+        self.active = 0
+        self._waiters = deque()
+
+    async def acquire(self) -> bool:
+        """Takes a slot, waiting in the queue when every slot is in use
+
+        Returns:
+            bool: True when a slot was taken and must be released, False when the request is rejected
+        """
+        if self.concurrency <= 0:
+            return True
+
+        if self.active < self.concurrency and not self._waiters:
+            self._take()
+            return True
+
+        if len(self._waiters) >= self.queue_size:
+            admission_rejected.inc(self.name, "queue_full")
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        admission_queue_depth.inc(self.name)
+        try:
+            await asyncio.wait_for(waiter, self.timeout or None)
+            return True
+        except BaseException as e:
+            # the slot was handed over just as the wait was cancelled or timed out
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+
+            if isinstance(e, asyncio.TimeoutError):
+                admission_rejected.inc(self.name, "timeout")
+                return False
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            admission_queue_depth.dec(self.name)
+
+    def release(self):
+        """Frees a slot, handing it to the longest waiting request if any"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+        self.active -= 1
+        admission_active.dec(self.name)
+
+    def waiting(self) -> int:
+        """Requests waiting for a slot
+
+        Returns:
+            int: queue length
+        """
+        return len(self._waiters)
+
+    def _take(self):
+        self.active += 1
+        admission_active.inc(self.name)
+
+def create_admission_limit(prefix: str, name: str, concurrency: int, queue_size: int, max_bytes: int) -> AdmissionLimit:
+    """Creates an admission limit configured through environment variables named after prefix
+
+    {prefix}_CONCURRENCY, {prefix}_QUEUE and {prefix}_MAX_BYTES override the defaults, ADMISSION_TIMEOUT and
+    ADMISSION_RETRY_AFTER are shared by every endpoint.
+
+    Args:
+        prefix (str): environment variable prefix e.g. IMAGE_PROCESS
+        name (str): endpoint label of the admission metrics
+        concurrency (int): default requests processed at the same time, 0 for no limit
+        queue_size (int): default requests waiting for a slot
+        max_bytes (int): default largest request body, 0 for no limit
+
+    Returns:
+        AdmissionLimit: the limit
+    """
+    return AdmissionLimit(
+        name,
+        int(os.getenv(f"{prefix}_CONCURRENCY", str(concurrency))),
+        int(os.getenv(f"{prefix}_QUEUE", str(queue_size))),
+        float(os.getenv("ADMISSION_TIMEOUT", "30")),
+        int(os.getenv(f"{prefix}_MAX_BYTES", str(max_bytes))),
+        int(os.getenv("ADMISSION_RETRY_AFTER", "5")),
+    )
+
+class AdmissionMiddleware:
+    """ASGI middleware applying admission limits and body size caps to endpoints
+
+    Requests over the limit are answered 429 with Retry-After before their body is read. Bodies bigger than the cap are
+    answered 413, right away when Content-Length says so or as soon as the streamed body goes over it otherwise.
+    A slot is held until the response is sent, including streamed responses.
+
+    Args:
+        app (ASGIApp): wrapped application
+        limits (dict): request path to its AdmissionLimit
+    """
+
+    def __init__(self, app, limits: dict):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            return await self.app(scope, receive, send)
+
+        if limit.max_bytes and int(dict(scope["headers"]).get(b"content-length", 0)) > limit.max_bytes:
+            admission_rejected.inc(limit.name, "too_large")
+            return await self.reject(scope, receive, send, 413, "The uploaded file is too large")
+
+        if not await limit.acquire():
+            return await self.reject(scope, receive, send, 429, "Too many requests, try again later",
+                                     { "Retry-After": str(limit.retry_after) })
+
+        received = 0
+        async def receive_limited():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request" and limit.max_bytes:
+                received += len(message.get("body", b""))
+                if received > limit.max_bytes:
+                    admission_rejected.inc(limit.name, "too_large")
+                    raise HTTPException(status_code=413, detail="The uploaded file is too large")
+
+            return message
+
+        try:
+            await self.app(scope, receive_limited, send)
+        finally:
+            limit.release()
+
+    async def reject(self, scope, receive, send, status: int, detail: str, headers: dict = None):
+        response = JSONResponse({ "detail": detail }, status_code=status, headers=headers)
+        await response(scope, receive, send)
@@ -0,0 +1,133 @@
+import hashlib
+import os
+import re
+import tempfile
+from typing import Union
+
+BLOB_HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+
+# raster image types accepted by the store by extension, types a browser could run code from, like SVG or HTML, are not
+BLOB_TYPES = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+    "image/bmp": ".bmp",
+    "image/tiff": ".tiff",
+    "image/avif": ".avif",
+}
+BLOB_EXTENSIONS = { extension: mime for mime, extension in BLOB_TYPES.items() }
+
+def blob_type(path: str) -> str:
+    """Content type of a stored blob
+
+    Args:
+        path (str): path of the blob
+
+    Returns:
+        str: content type from the extension, application/octet-stream when unknown
+    """
+    return BLOB_EXTENSIONS.get(os.path.splitext(path)[1], "application/octet-stream")
+
+class BlobStore:
+    """Content addressed file store, each blob is kept once under the sha256 of its content
+
+    Blobs are written to {path}/{first two hash characters}/{hash}{extension} so directories stay small and the
+    extension lets the content type be served without extra metadata. Only the raster image types in BLOB_TYPES are
+    accepted since blobs are served from the API origin. The store can be shared by worker processes.
+
+    Args:
+        path (str): root folder of the store
+        base_url (str): URL prefix the hash is appended to, default is /image/
+    """
+
+    def __init__(self, path: str, base_url: str = "/image/"):
+        self.path = path
+        self.base_url = base_url
+
+    def put(self, content: bytes, mime: str) -> str:
+        """Stores content unless a blob with the same content exists
+
+        Args:
+            content (bytes): blob content
+            mime (str): content type e.g. image/jpeg
+
+        Raises:
+            ValueError: when the content type is not in BLOB_TYPES
+
+        Returns:
+            str: sha256 of the content
+        """
+        extension = BLOB_TYPES.get((mime or "").split(";")[0].strip().lower())
+        if extension is None:
+            raise ValueError(f"Blobs of type {mime} cannot be stored")
+
+        hash = hashlib.sha256(content).hexdigest()
+        folder = os.path.join(self.path, hash[:2])
+        path = os.path.join(folder, hash + extension)
+        if os.path.exists(path):
+            return hash
+
+        os.makedirs(folder, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(content)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+        return hash
+
+    def find(self, hash: str) -> Union[str, None]:
+        """Finds the file of a blob
+
+        Args:
+            hash (str): sha256 of the blob content
+
+        Returns:
+            str | None: path of the blob, None when the hash is malformed or unknown
+        """
+        if not BLOB_HASH_RE.match(hash):
+            return None
+
+        folder = os.path.join(self.path, hash[:2])
+        try:
+            names = os.listdir(folder)
+        except FileNotFoundError:
+            return None
+
+        for name in names:
+            if name.startswith(hash):
+                return os.path.join(folder, name)
+
+        return None
+
+    def url(self, hash: str) -> str:
+        """URL a blob is served from
+
+        Args:
+            hash (str): sha256 of the blob content
+
+        Returns:
+            str: base URL followed by the hash
+        """
+        return self.base_url + hash
+
+def create_blob_store(prefix: str) -> Union[BlobStore, None]:
+    """Creates a blob store configured through environment variables named after prefix
+
+    {prefix}_PATH enables the store in that folder and {prefix}_URL overrides the URL prefix blobs are served from.
+
+    Args:
+        prefix (str): environment variable prefix e.g. IMAGE_STORE
+
+    Returns:
+        BlobStore | None: the store, None when {prefix}_PATH is not set
+    """
+    path = os.getenv(f"{prefix}_PATH", "")
+    if not path:
+        return None
+
+    return BlobStore(path, os.getenv(f"{prefix}_URL", "/image/"))
@@ -0,0 +1,352 @@
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from time import monotonic, time
+from typing import Any, Callable, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from fastapi.concurrency import run_in_threadpool
+
+TRACKING_PARAMS = {"fbclid", "gclid", "mc_cid", "mc_eid"}
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+def normalize_url(url: str) -> str:
+    """Normalizes a recipe URL so equivalent addresses share a cache entry
+
+    Args:
+        url (str): URL as sent by the client
+
+    Returns:
+        str: URL with lower case scheme and host, no default port, fragment or tracking parameters and sorted query
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+
+    path = parts.path.rstrip("/") or "/"
+    query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+             if not key.startswith("utm_") and key not in TRACKING_PARAMS]
+
+    return urlunsplit((scheme, host, path, urlencode(sorted(query)), ""))
+
+def hit_ratio(hits: int, misses: int) -> float:
+    """Ratio of lookups served from a cache
+
+    Args:
+        hits (int): lookups found in the cache
+        misses (int): lookups not found in the cache
+
+    Returns:
+        float: hits over lookups, 0 when there were no lookups
+    """
+    lookups = hits + misses
+    return round(hits / lookups, 4) if lookups else 0
+
+class MemoryCache:
+    """In-process LRU cache with time based expiration
+
+    Args:
+        max_entries (int): entries kept before the least recently used is evicted
+        ttl (float): seconds an entry is valid for, 0 or None to never expire
+        max_bytes (int): total size of the values kept before the least recently used is evicted, None for no limit
+        sizeof (Callable): size of a value in bytes, default is len
+    """
+    backend = "memory"
+
+    def __init__(self, max_entries: int = 512, ttl: Union[float, None] = 3600, max_bytes: Union[int, None] = None,
+                 sizeof: Callable[[Any], int] = len):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        """Gets a value from the cache
+
+        Args:
+            key (str): cache key
+
+        Returns:
+            Any: cached value or None when missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is not None and entry[0] <= monotonic():
+                del self._entries[key]
+                self.bytes -= entry[2]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: Any):
+        """Stores a value in the cache, evicting the least recently used entries when full
+
+        Values bigger than max_bytes are not stored.
+
+        Args:
+            key (str): cache key
+            value (Any): value to store
+        """
+        expires_at = monotonic() + self.ttl if self.ttl else None
+        size = self.sizeof(value) if self.max_bytes else 0
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[2]
+
+            if self.max_bytes and size > self.max_bytes:
+                return
+
+            self._entries[key] = (expires_at, value, size)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or (self.max_bytes and self.bytes > self.max_bytes):
+                self.bytes -= self._entries.popitem(last=False)[1][2]
+
+    def clear(self):
+        """Removes every entry from the cache"""
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        """Cache counters
+
+        Returns:
+            dictionary: backend, hits, misses, hit ratio, current size and bytes when bounded by size
+        """
+        result = { "backend": self.backend, "hits": self.hits, "misses": self.misses,
+                   "hit_ratio": hit_ratio(self.hits, self.misses), "size": len(self._entries) }
+        if self.max_bytes:
+            result["bytes"] = self.bytes
+
+        return result
+
+class SqliteCache:
+    """On-disk LRU cache with time based expiration backed by SQLite
+
+    The database can be shared by several worker processes and survives restarts. Values must be JSON serializable.
+
+    Args:
+        path (str): SQLite database file
+        max_entries (int): entries kept before the least recently used are evicted
+        ttl (float): seconds an entry is valid for, 0 or None to never expire
+    """
+    backend = "sqlite"
+
+    def __init__(self, path: str, max_entries: int = 512, ttl: Union[float, None] = 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+
+        with self._connection() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("""CREATE TABLE IF NOT EXISTS cache_entries (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL,
+                accessed_at REAL NOT NULL)""")
+            connection.execute("CREATE INDEX IF NOT EXISTS cache_entries_accessed ON cache_entries (accessed_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5)
+            self._local.connection = connection
+
+        return connection
+
+    def get(self, key: str) -> Any:
+        """Gets a value from the cache
+
+        Args:
+            key (str): cache key
+
+        Returns:
+            Any: cached value or None when missing or expired
+        """
+        now = time()
+        with self._connection() as connection:
+            row = connection.execute("SELECT value FROM cache_entries WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                                     (key, now)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            connection.execute("UPDATE cache_entries SET accessed_at = ? WHERE key = ?", (now, key))
+
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any):
+        """Stores a value in the cache, evicting expired and least recently used entries when full
+
+        Args:
+            key (str): cache key
+            value (Any): JSON serializable value to store
+        """
+        now = time()
+        expires_at = now + self.ttl if self.ttl else None
+        with self._connection() as connection:
+            connection.execute("INSERT OR REPLACE INTO cache_entries (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                               (key, json.dumps(value), expires_at, now))
+            connection.execute("DELETE FROM cache_entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+            connection.execute("""DELETE FROM cache_entries WHERE key IN (
+                SELECT key FROM cache_entries ORDER BY accessed_at
+                LIMIT MAX((SELECT COUNT(*) FROM cache_entries) - ?, 0))""", (self.max_entries,))
+
+    def clear(self):
+        """Removes every entry from the cache"""
+        with self._connection() as connection:
+            connection.execute("DELETE FROM cache_entries")
+
+    def stats(self) -> dict:
+        """Cache counters
+
+        Returns:
+            dictionary: backend, hits, misses, hit ratio and current size
+        """
+        size = self._connection().execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+        return { "backend": self.backend, "hits": self.hits, "misses": self.misses,
+                 "hit_ratio": hit_ratio(self.hits, self.misses), "size": size }
+
+class TieredCache:
+    """Memory cache in front of a larger on-disk cache
+
+    Entries found on disk are promoted to memory and new entries are stored in both.
+
+    Args:
+        memory (MemoryCache): first tier
+        disk (SqliteCache): second tier
+    """
+    backend = "tiered"
+
+    def __init__(self, memory: MemoryCache, disk: SqliteCache):
+        self.memory = memory
+        self.disk = disk
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Any:
+        """Gets a value from memory, or from disk when it was evicted from memory
+
+        Args:
+            key (str): cache key
+
+        Returns:
+            Any: cached value or None when missing or expired
+        """
+        value = self.memory.get(key)
+        if value is None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return value
+
+    def set(self, key: str, value: Any):
+        """Stores a value in memory and on disk
+
+        Args:
+            key (str): cache key
+            value (Any): JSON serializable value to store
+        """
+        self.memory.set(key, value)
+        self.disk.set(key, value)
+
+    def clear(self):
+        """Removes every entry from both tiers"""
+        self.memory.clear()
+        self.disk.clear()
+
+    def stats(self) -> dict:
+        """Cache counters
+
+        Returns:
+            dictionary: backend, hits, misses and hit ratio across tiers, plus the counters of each tier
+        """
+        return { "backend": self.backend, "hits": self.hits, "misses": self.misses,
+                 "hit_ratio": hit_ratio(self.hits, self.misses), "memory": self.memory.stats(), "disk": self.disk.stats() }
+
+def create_cache(prefix: str, max_entries: int = 512, ttl: float = 3600, path: str = "cache.db",
+                 max_bytes: Union[int, None] = None, disk_entries: Union[int, None] = None,
+                 sizeof: Callable[[Any], int] = len):
+    """Creates a cache configured through environment variables named after prefix
+
+    {prefix}_BACKEND selects memory (default), sqlite, tiered (memory in front of sqlite) or none; {prefix}_SIZE,
+    {prefix}_TTL, {prefix}_PATH, {prefix}_MAX_BYTES and {prefix}_DISK_SIZE override the maximum entries, time to live
+    in seconds, SQLite database file, maximum bytes kept in memory and maximum entries kept on disk by the tiered cache.
+
+    Args:
+        prefix (str): environment variable prefix e.g. RECIPE_CACHE
+        max_entries (int): default maximum entries
+        ttl (float): default time to live in seconds
+        path (str): default SQLite database file
+        max_bytes (int): default maximum bytes kept in memory, None for no limit
+        disk_entries (int): default maximum entries kept on disk by the tiered cache, max_entries when None
+        sizeof (Callable): size of a value in bytes when bounded by max_bytes, default is len
+
+    Returns:
+        MemoryCache | SqliteCache | TieredCache | None: the cache, None when disabled
+    """
+    backend = os.getenv(f"{prefix}_BACKEND", "memory").lower()
+    max_entries = int(os.getenv(f"{prefix}_SIZE", max_entries))
+    ttl = float(os.getenv(f"{prefix}_TTL", ttl))
+    max_bytes = int(os.getenv(f"{prefix}_MAX_BYTES", max_bytes or 0)) or None
+    path = os.getenv(f"{prefix}_PATH", path)
+
+    if backend == "none":
+        return None
+
+    if backend == "sqlite":
+        return SqliteCache(path, max_entries, ttl)
+
+    if backend == "tiered":
+        disk_entries = int(os.getenv(f"{prefix}_DISK_SIZE", disk_entries or max_entries))
+        return TieredCache(MemoryCache(max_entries, ttl, max_bytes, sizeof), SqliteCache(path, disk_entries, ttl))
+
+    return MemoryCache(max_entries, ttl, max_bytes, sizeof)
+
+async def call_cache(cache: Any, method: str, *args) -> Any:
+    """Calls a cache method from async code without blocking the event loop
+
+    Memory caches are called directly. Caches backed by SQLite are called in the threadpool, since their reads, writes
+    and JSON encoding of values can take long and wait up to seconds for the database lock.
+
+    Args:
+        cache (MemoryCache | SqliteCache | TieredCache | None): the cache, None when disabled
+        method (str): get or set
+        args: arguments of the method
+
+    Returns:
+        Any: result of the method, None when the cache is disabled
+    """
+    if cache is None:
+        return None
+
+    if cache.backend == "memory":
+        return getattr(cache, method)(*args)
+
+    return await run_in_threadpool(getattr(cache, method), *args)
@@ -0,0 +1,227 @@
+import asyncio
+import base64
+import importlib.util
+import os
+import httpx
+from typing import Union
+from urllib.parse import urlsplit
+from fastapi.concurrency import run_in_threadpool
+from src.cache import call_cache, create_cache
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:86.0) Gecko/20100101 Firefox/86.0"
+
+def parse_host_timeouts(value: str) -> dict:
+    """Parses per host timeouts formatted as host=seconds separated by comma
+
+    Args:
+        value (str): e.g. www.foodnetwork.com=5,slow.example.com=30
+
+    Returns:
+        dictionary: host to timeout in seconds
+    """
+    result = {}
+    for item in value.split(","):
+        if "=" in item:
+            host, seconds = item.split("=", 1)
+            result[host.strip().lower()] = float(seconds)
+
+    return result
+
+fetch_timeout = float(os.getenv("FETCH_TIMEOUT", "10"))
+fetch_host_timeouts = parse_host_timeouts(os.getenv("FETCH_HOST_TIMEOUTS", ""))
+fetch_concurrency = int(os.getenv("FETCH_CONCURRENCY", "20"))
+fetch_host_concurrency = int(os.getenv("FETCH_HOST_CONCURRENCY", "4"))
+fetch_max_bytes = int(os.getenv("FETCH_MAX_BYTES", str(20 * 1024 * 1024)))
+fetch_image_max_bytes = int(os.getenv("FETCH_IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))
+# HTTP/2 needs the optional h2 package, installed with httpx[http2]
+fetch_http2 = os.getenv("FETCH_HTTP2", "1") == "1" and importlib.util.find_spec("h2") is not None
+
+fetch_cache = create_cache("FETCH_CACHE", max_entries=256, ttl=7 * 24 * 3600, path="fetch_cache.db",
+                           max_bytes=64 * 1024 * 1024, sizeof=lambda entry: len(entry["content"]))
+
+class ResponseTooLarge(httpx.HTTPError):
+    """Raised when a response is bigger than the allowed size"""
+
+_client = None
+_semaphore = None
+_host_semaphores = {}
+_loop = None
+
+def get_client() -> httpx.AsyncClient:
+    """Gets the pooled HTTP client shared by every fetch in the running event loop
+
+    Returns:
+        httpx.AsyncClient: client keeping connections alive between requests
+    """
+    global _client, _semaphore, _host_semaphores, _loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _loop is not loop:
+        _client = httpx.AsyncClient(
+            headers={ "User-Agent": USER_AGENT },
+            follow_redirects=True,
+            http2=fetch_http2,
+            limits=httpx.Limits(max_connections=fetch_concurrency, max_keepalive_connections=fetch_concurrency))
+        _semaphore = asyncio.Semaphore(fetch_concurrency)
+        _host_semaphores = {}
+        _loop = loop
+
+    return _client
+
+async def close_client():
+    """Closes the pooled HTTP client, a new one is created on the next fetch"""
+    global _client, _semaphore, _host_semaphores, _loop
+    if _client is not None:
+        await _client.aclose()
+
+    _client = _semaphore = _loop = None
+    _host_semaphores = {}
+
+def get_host(url: str) -> str:
+    """Host of an URL in lower case
+
+    Args:
+        url (str): URL
+
+    Returns:
+        str: host name
+    """
+    return (urlsplit(url).hostname or "").lower()
+
+def get_timeout(url: str) -> float:
+    """Timeout for requests to the host of an URL
+
+    Args:
+        url (str): URL about to be fetched
+
+    Returns:
+        float: host specific timeout in seconds when configured, otherwise the default one
+    """
+    return fetch_host_timeouts.get(get_host(url), fetch_timeout)
+
+def revalidation_headers(cached: Union[dict, None]) -> dict:
+    """Conditional request headers for a cached response
+
+    Args:
+        cached (dict): cached response with etag and last_modified, None when not cached
+
+    Returns:
+        dictionary: If-None-Match and If-Modified-Since headers, empty when not cached
+    """
+    headers = {}
+    if cached is not None:
+        if cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        if cached["last_modified"]:
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    return headers
+
+async def read_limited(response: httpx.Response, max_bytes: int) -> bytes:
+    """Reads a streamed response body, decompressed, up to a maximum size
+
+    Args:
+        response (httpx.Response): streamed response
+        max_bytes (int): maximum body size, 0 for no limit
+
+    Raises:
+        ResponseTooLarge: when Content-Length or the decompressed body exceeds max_bytes
+
+    Returns:
+        bytes: response body
+    """
+    if max_bytes and int(response.headers.get("Content-Length") or 0) > max_bytes:
+        raise ResponseTooLarge(f"Response of {response.url} is bigger than {max_bytes} bytes")
+
+    chunks = []
+    size = 0
+    async for chunk in response.aiter_bytes():
+        size += len(chunk)
+        if max_bytes and size > max_bytes:
+            raise ResponseTooLarge(f"Response of {response.url} is bigger than {max_bytes} bytes")
+        chunks.append(chunk)
+
+    return b"".join(chunks)
+
+def cache_response(url: str, etag: Union[str, None], last_modified: Union[str, None], content_type: str,
+                   content: bytes):
+    """Keeps a response in the fetch cache to revalidate it on the next fetch, called in the threadpool since the
+    content is base64 encoded and may be written to SQLite
+
+    Args:
+        url (str): URL fetched
+        etag (str): ETag header, None when missing
+        last_modified (str): Last-Modified header, None when missing
+        content_type (str): Content-Type header
+        content (bytes): response body
+    """
+    fetch_cache.set(url, { "etag": etag, "last_modified": last_modified, "content_type": content_type,
+                           "content": base64.b64encode(content).decode() })
+
+async def fetch(url: str, max_bytes: Union[int, None] = None) -> httpx.Response:
+    """Fetches an URL honoring the global and per host concurrency caps, the host timeout and a size limit
+
+    Responses with an ETag or Last-Modified header are kept in the fetch cache and revalidated on the next fetch of the
+    same URL, so an unchanged page or image is answered with an empty 304 and served from the cache.
+
+    Args:
+        url (str): URL to fetch
+        max_bytes (int): maximum decompressed body size, FETCH_MAX_BYTES when None
+
+    Raises:
+        httpx.HTTPError: when the request fails or the response is not successful
+        ResponseTooLarge: when the response is bigger than max_bytes
+
+    Returns:
+        httpx.Response: the response with its content loaded
+    """
+    client = get_client()
+    host = get_host(url)
+    host_semaphore = _host_semaphores.get(host)
+    if host_semaphore is None:
+        host_semaphore = _host_semaphores[host] = asyncio.Semaphore(fetch_host_concurrency)
+
+    cached = await call_cache(fetch_cache, "get", url)
+    async with host_semaphore, _semaphore:
+        async with client.stream("GET", url, headers=revalidation_headers(cached), timeout=get_timeout(url)) as response:
+            if response.status_code == 304 and cached is not None:
+                content = await run_in_threadpool(base64.b64decode, cached["content"])
+                return httpx.Response(200, headers={ "Content-Type": cached["content_type"] }, content=content,
+                                      request=response.request)
+
+            response.raise_for_status()
+            content = await read_limited(response, fetch_max_bytes if max_bytes is None else max_bytes)
+
+    headers = { "Content-Type": response.headers.get("Content-Type", "application/octet-stream") }
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if fetch_cache and (etag or last_modified):
+        await run_in_threadpool(cache_response, url, etag, last_modified, headers["Content-Type"], content)
+
+    return httpx.Response(response.status_code, headers=headers, content=content, request=response.request)
+
+async def fetch_html(url: str) -> str:
+    """Fetches the HTML of a web page
+
+    Args:
+        url (str): URL of the page
+
+    Returns:
+        str: page HTML
+    """
+    response = await fetch(url)
+    return response.text
+
+async def fetch_image_content(image_url: str) -> tuple:
+    """Pulls an image from a web server, aborting as soon as it is bigger than FETCH_IMAGE_MAX_BYTES
+
+    Args:
+        image_url (str): URL of the image to pull
+
+    Raises:
+        ResponseTooLarge: when the image is bigger than FETCH_IMAGE_MAX_BYTES
+
+    Returns:
+        tuple: mime type and image content
+    """
+    response = await fetch(image_url, fetch_image_max_bytes)
+    return response.headers["Content-Type"], response.content
@@ -0,0 +1,52 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+from src.metrics import coalesced_calls
+
+class SingleFlight:
+    """Runs concurrent calls with the same key once, every caller gets the result or error of that single call
+
+    The call runs in its own task so a caller going away, e.g. a client disconnecting, does not cancel it for the
+    other callers.
+
+    Args:
+        name (str): name of the call in the coalesced_calls_total metric
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls = {}
+
+    async def run(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Runs fn unless a call with the same key is in flight, in which case its result is awaited instead
+
+        Args:
+            key (str): identity of the call
+            fn (Callable): coroutine function making the call
+
+        Returns:
+            Any: result of the call
+        """
+        task = self._calls.get(key)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = self._calls[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda done: self._done(key, done))
+        else:
+            coalesced_calls.inc(self.name)
+
+        return await asyncio.shield(task)
+
+    def _done(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+        # marks the error retrieved when every caller went away before the call finished
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        """Calls currently running
+
+        Returns:
+            int: number of keys with a call in flight
+        """
+        return len(self._calls)
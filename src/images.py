@@ -0,0 +1,245 @@
+import hashlib
+import os
+import threading
+from concurrent.futures import Future
+from time import perf_counter
+from typing import Iterable, Iterator, Union
+from src.blobs import BLOB_TYPES, BlobStore, create_blob_store
+from src.cache import create_cache
+from src.metrics import stage_seconds, timed
+from src.models import ImageFormat
+from src.pool import image_pool_window, ordered_map, submit_image_task
+from src.util import parse_image, process_image, to_data_uri
+
+image_cache = create_cache("IMAGE_CACHE", max_entries=1024, ttl=0, path="image_cache.db", max_bytes=64 * 1024 * 1024,
+                           disk_entries=16384)
+image_store = create_blob_store("IMAGE_STORE")
+
+image_output_format = ImageFormat(os.getenv("IMAGE_OUTPUT_FORMAT", "original")).value
+image_output_quality = int(os.getenv("IMAGE_OUTPUT_QUALITY", "0")) or None
+image_output_max_bytes = int(os.getenv("IMAGE_OUTPUT_MAX_BYTES", "0"))
+
+_saved = { "bytes": 0 }
+_saved_lock = threading.Lock()
+
+def image_output() -> tuple:
+    """Output policy of processed images
+
+    Returns:
+        tuple: IMAGE_OUTPUT_FORMAT, IMAGE_OUTPUT_QUALITY and IMAGE_OUTPUT_MAX_BYTES as parse_image arguments
+    """
+    return (image_output_format, image_output_quality, image_output_max_bytes)
+
+def image_conversion_enabled() -> bool:
+    """Whether the output policy differs from re-encoding images in their original format at the default quality
+
+    Returns:
+        bool: True when IMAGE_OUTPUT_FORMAT, IMAGE_OUTPUT_QUALITY or IMAGE_OUTPUT_MAX_BYTES is set
+    """
+    return image_output() != ("original", None, 0)
+
+def image_cache_key(name: str, image: bytes, resize: bool, mode: str) -> str:
+    """Content based cache key of a processed image
+
+    Args:
+        name (str): file name, its extension decides the output format
+        image (bytes): image content
+        resize (bool): whether the image is resized
+        mode (str): resize mode
+
+    Returns:
+        str: hash of the content followed by the processing parameters and output policy when not the default, marked
+        when the result is a stored image URL
+    """
+    extension = os.path.splitext(name)[1].lower()
+    key = f"{hashlib.sha256(image).hexdigest()}|{extension}|{resize}|{mode}"
+    if image_conversion_enabled():
+        key += "|" + "|".join(map(str, image_output()))
+
+    return key + "|store" if image_store else key
+
+def store_image(store: BlobStore, name: str, image: bytes, resize: bool = True, mode: str = "balanced", *output) -> str:
+    """Processes an image like parse_image but keeps the result in the blob store instead of encoding it in base64
+
+    Args:
+        store (BlobStore): store the processed image is written to
+        name (str): file name
+        image (bytes): image content
+        resize (bool): whether to resize the image or not, default is True
+        mode (str): resize mode, default is balanced
+        output: output format, quality and maximum bytes
+
+    Returns:
+        str: URL the processed image is served from
+    """
+    mime, content = process_image(name, image, resize, mode, *output)
+    return store.url(store.put(content, mime))
+
+def process_image_task(name: str, image: bytes, resize: bool = True, mode: str = "balanced") -> str:
+    """Processes an image following the output policy into a data URI, or into the image store when IMAGE_STORE_PATH is set
+
+    Args:
+        name (str): file name
+        image (bytes): image content
+        resize (bool): whether to resize the image or not, default is True
+        mode (str): resize mode, default is balanced
+
+    Returns:
+        str: uri formatted base 64 image or URL of the stored image
+    """
+    with timed("image_process"):
+        if image_store is None:
+            return parse_image(name, image, resize, mode, *image_output())
+
+        return store_image(image_store, name, image, resize, mode, *image_output())
+
+def _submit_image(name: str, image: bytes, resize: bool = True, mode: str = "balanced") -> Future:
+    start = perf_counter()
+    if image_store is None:
+        future = submit_image_task(parse_image, name, image, resize, mode, *image_output())
+    else:
+        future = submit_image_task(store_image, image_store, name, image, resize, mode, *image_output())
+
+    future.add_done_callback(lambda done: stage_seconds.observe("image_process", value=perf_counter() - start))
+    return future
+
+def _record_saved(image: bytes):
+    with _saved_lock:
+        _saved["bytes"] += len(image)
+
+def submit_cached_image(name: str, image: bytes, resize: bool = True, mode: str = "balanced") -> Future:
+    """Processes an image with parse_image in the image pool unless the same image was processed before
+
+    Args:
+        name (str): file name
+        image (bytes): image content
+        resize (bool): whether to resize the image or not, default is True
+        mode (str): resize mode, default is balanced
+
+    Returns:
+        Future: uri formatted base 64 image or URL of the stored image
+    """
+    if image_cache is None:
+        return _submit_image(name, image, resize, mode)
+
+    key = image_cache_key(name, image, resize, mode)
+    cached = image_cache.get(key)
+    if cached is not None:
+        _record_saved(image)
+        future = Future()
+        future.set_result(cached)
+        return future
+
+    def store(done: Future):
+        if not done.cancelled() and done.exception() is None:
+            image_cache.set(key, done.result())
+
+    future = _submit_image(name, image, resize, mode)
+    future.add_done_callback(store)
+    return future
+
+def parse_image_cached(name: str, image: bytes, resize: bool = True, mode: str = "balanced") -> str:
+    """parse_image memoized by image content and processing parameters
+
+    Args:
+        name (str): file name
+        image (bytes): image content
+        resize (bool): whether to resize the image or not, default is True
+        mode (str): resize mode, default is balanced
+
+    Returns:
+        str: uri formatted base 64 image or URL of the stored image
+    """
+    if image_cache is None:
+        return process_image_task(name, image, resize, mode)
+
+    key = image_cache_key(name, image, resize, mode)
+    cached = image_cache.get(key)
+    if cached is not None:
+        _record_saved(image)
+        return cached
+
+    result = process_image_task(name, image, resize, mode)
+    image_cache.set(key, result)
+    return result
+
+def parse_images(items: Iterable[tuple]) -> Iterator[str]:
+    """Processes images with parse_image in order, in the image pool and skipping images processed before
+
+    Args:
+        items (Iterable[tuple]): parse_image arguments of each image
+
+    Returns:
+        Iterator[str]: uri formatted base 64 images or URLs of the stored images in item order
+    """
+    return ordered_map(submit_cached_image, items, image_pool_window())
+
+def save_image(mime: str, content: bytes) -> str:
+    """Keeps an already processed image in the image store when IMAGE_STORE_PATH is set
+
+    Args:
+        mime (str): content type e.g. image/jpeg
+        content (bytes): image content
+
+    Raises:
+        ValueError: when the store is enabled and the content type is not a raster image type of BLOB_TYPES, e.g. SVG
+            or HTML
+
+    Returns:
+        str: URL of the stored image, or uri formatted base 64 image when the store is disabled
+    """
+    if image_store is None:
+        return to_data_uri(mime, content)
+
+    if mime not in BLOB_TYPES:
+        raise ValueError(f"Images of type {mime} are not accepted")
+
+    return image_store.url(image_store.put(content, mime))
+
+def save_downloaded_image(mime: str, content: bytes, mode: str = "balanced") -> str:
+    """Resizes and encodes a downloaded image like backup images, in the image pool and skipping images processed before
+
+    Images Pillow cannot process, such as SVG, are kept as downloaded. The image store only keeps raster images, so
+    other content like SVG or HTML is refused when IMAGE_STORE_PATH is set.
+
+    Args:
+        mime (str): content type e.g. image/jpeg
+        content (bytes): image content
+        mode (str): resize mode, default is balanced
+
+    Raises:
+        ValueError: when the content cannot be processed, is not a raster image type and the store is enabled
+
+    Returns:
+        str: uri formatted base 64 image or URL of the stored image
+    """
+    mime = mime.split(";")[0].strip().lower()
+    try:
+        return submit_cached_image("image" + BLOB_TYPES.get(mime, ""), content, True, mode).result()
+    except OSError:
+        return save_image(mime, content)
+
+def find_image(hash: str) -> Union[str, None]:
+    """Finds a stored image
+
+    Args:
+        hash (str): sha256 of the image content
+
+    Returns:
+        str | None: path of the image, None when it is not stored or the store is disabled
+    """
+    if image_store is None:
+        return None
+
+    return image_store.find(hash)
+
+def image_cache_stats() -> dict:
+    """Image cache counters
+
+    Returns:
+        dictionary: cache counters with the image bytes that skipped processing, None when caching is disabled
+    """
+    if image_cache is None:
+        return None
+
+    return { **image_cache.stats(), "bytes_saved": _saved["bytes"] }
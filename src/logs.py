@@ -0,0 +1,147 @@
+import json
+import logging
+import os
+import queue
+import random
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from time import monotonic, strftime, gmtime
+from uuid import UUID
+from src.metrics import request_stages
+
+log_sample_after = int(os.getenv("LOG_SAMPLE_AFTER", "100"))
+log_sample_rate = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+log_queue_size = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# attributes every LogRecord has, anything else was passed with extra and is written as a field
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "sample"}
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one json object per line with the fields passed in extra"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": strftime("%Y-%m-%dT%H:%M:%S", gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES:
+                entry[key] = value
+
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+
+        return json.dumps(entry, default=str)
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of the records marked with sample once more than a number of them are logged in a second
+
+    Records without the sample attribute, like errors, are always kept.
+
+    Args:
+        after (int): sampled records kept every second before sampling starts, 0 to always sample
+        rate (float): fraction of the sampled records kept past that, 1 to keep every record
+    """
+
+    def __init__(self, after: int = 100, rate: float = 0.1):
+        super().__init__()
+        self.after = after
+        self.rate = rate
+        self._second = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "sample", False) or self.rate >= 1:
+            return True
+
+        second = int(monotonic())
+        with self._lock:
+            if second != self._second:
+                self._second = second
+                self._count = 0
+            self._count += 1
+            count = self._count
+
+        return count <= self.after or random.random() < self.rate
+
+class DroppingQueueHandler(QueueHandler):
+    """Queue handler that drops records instead of blocking the request when the writer falls behind"""
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+def setup_logging(path: str, level: int = logging.INFO) -> QueueListener:
+    """Routes the root logger through a queue to a json rotating file written by a background thread
+
+    Request threads only put records on the queue, so they never wait on the file lock, writes or rotation.
+
+    Args:
+        path (str): log file
+        level (int): root logger level, default is INFO
+
+    Returns:
+        QueueListener: the started background writer, stop it to flush the queue on shutdown
+    """
+    file_handler = RotatingFileHandler(path, maxBytes=5000000, backupCount=5)
+    file_handler.setFormatter(JsonFormatter())
+
+    log_queue = queue.Queue(log_queue_size)
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(log_sample_after, log_sample_rate))
+
+    logger = logging.getLogger()
+    logger.setLevel(level)
+    logger.addHandler(queue_handler)
+
+    listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+    listener.start()
+    return listener
+
+def start_logging(listener: QueueListener):
+    """Starts the background writer again after stop_logging, does nothing when it is running
+
+    Args:
+        listener (QueueListener): writer returned by setup_logging
+    """
+    if listener._thread is None:
+        listener.start()
+
+def stop_logging(listener: QueueListener):
+    """Writes the records still queued and stops the background writer
+
+    Args:
+        listener (QueueListener): writer returned by setup_logging
+    """
+    if listener._thread is not None:
+        listener.stop()
+
+def log_finished(logger: logging.Logger, message: str, correlation_id: UUID, seconds: float, **fields):
+    """Logs the end of a request with its duration and stage timings, sampled at high request rates
+
+    Args:
+        logger (logging.Logger): logger to write to
+        message (str): e.g. Finished processing parse request
+        correlation_id (UUID): id of the request
+        seconds (float): time taken
+        fields: other fields of the record, e.g. url
+    """
+    logger.info(message, extra={ "correlation_id": str(correlation_id), "seconds": round(seconds, 4),
+                                 "stages": request_stages(), "sample": True, **fields })
+
+def log_failed(logger: logging.Logger, message: str, correlation_id: UUID, error: Exception, **fields):
+    """Logs a failed request, never sampled
+
+    Args:
+        logger (logging.Logger): logger to write to
+        message (str): e.g. Failed to process parse request
+        correlation_id (UUID): id of the request
+        error (Exception): cause of the failure
+        fields: other fields of the record, e.g. url
+    """
+    logger.error(message, extra={ "correlation_id": str(correlation_id), "error": str(error), **fields })
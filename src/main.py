@@ -1,20 +1,45 @@
+import asyncio
+import hashlib
 import io
 import json
 import os
 import logging
+from collections import deque
+from contextlib import asynccontextmanager
 from zipfile import ZipFile
-from fastapi import FastAPI, HTTPException, UploadFile
+from fastapi import FastAPI, Form, HTTPException, Query, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from logging.handlers import RotatingFileHandler
-from recipe_scrapers import scrape_me
-from pint import UnitRegistry
-from uuid import uuid4
+from fastapi.responses import FileResponse, PlainTextResponse, Response, StreamingResponse
+from recipe_scrapers import scrape_html
+from typing import BinaryIO, Iterator, Union
+from uuid import UUID, uuid4
 from time import perf_counter
-from src.util import parse_recipe_ingredient, parse_recipe_ingredients, parse_recipe_instruction
-from src.util import parse_recipe_instructions, parse_recipe_image, parse_image
-from src.models import ImageResult, ParseRequest, Recipe
+from src.util import parse_recipe_ingredients, parse_recipe_ingredients_batch, parse_recipe_instructions_batch
+from src.util import parse_recipe_instructions, iter_json_array
+from src.models import ConvertRequest, ImageResult, ParseRequest, Recipe, ResizeMode
+from src.cache import call_cache, create_cache, normalize_url
+from src.units import convert_recipes, get_unit_registry
+from src.fetch import close_client, fetch_html, fetch_image_content
+from src.pool import shutdown_image_pool
+from src.flight import SingleFlight
+from src.blobs import blob_type
+from src.recipes import create_recipe_store
+from src.responses import FastJSONResponse, dumps, dumps_line
+from src.admission import AdmissionMiddleware, create_admission_limit
+from src.logs import log_failed, log_finished, setup_logging, start_logging, stop_logging
+from src.metrics import MetricsMiddleware, mark_handled, render_metrics, timed
+from src.images import find_image, image_cache_stats, parse_image_cached, parse_images, save_downloaded_image
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_logging(log_listener)
+    yield
+    await close_client()
+    shutdown_image_pool()
+    stop_logging(log_listener)
+
+app = FastAPI(lifespan=lifespan)
 
 environment = os.getenv("APP_ENVIRONMENT", "DEV")
 
@@ -27,6 +52,13 @@ if environment != "PROD":
         "http://localhost:8080",
     ]
 
+admission_limits = {
+    "/image/process": create_admission_limit("IMAGE_PROCESS", "/image/process", os.cpu_count() or 1, 16,
+                                             20 * 1024 * 1024),
+    "/recipe/backup/parse": create_admission_limit("BACKUP_PARSE", "/recipe/backup/parse", 2, 4, 0),
+}
+
+app.add_middleware(AdmissionMiddleware, limits=admission_limits)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -34,15 +66,147 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware, routes=app.router.routes)
 
-ureg = UnitRegistry()
+log_listener = setup_logging('local.log')
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
-handler = RotatingFileHandler('local.log', maxBytes=5000000, backupCount=5)
-logger.addHandler(handler)
+
+# RECIPE_CACHE_MAX_BYTES bounds the json size of the cached recipes, mostly their base64 images
+recipe_cache = create_cache("RECIPE_CACHE", path="recipe_cache.db", sizeof=lambda recipe: len(dumps(recipe)))
+batch_max_items = int(os.getenv("BATCH_MAX_ITEMS", "50"))
+recipe_flights = SingleFlight("recipe_parse")
+recipe_store = create_recipe_store("RECIPE_STORE")
+
+image_resize_mode = ResizeMode(os.getenv("IMAGE_RESIZE_MODE", "balanced"))
+
+BACKUP_RECIPES_FILE = "SharpBackup_Recipe.json"
+
+def parse_scraped_recipe(scraper) -> dict:
+    """Parses the recipe found by a scraper
+
+    Args:
+        scraper (AbstractScraper): scraper loaded with the recipe web page
+
+    Returns:
+        dictionary: title, totalTime, yields, ingredients list, instructions list, image, host
+    """
+    lang = scraper.language() or "en"
+
+    with timed("ingredient_parse"):
+        ingredients = parse_recipe_ingredients_batch(scraper.ingredients(), lang, get_unit_registry())
+
+    with timed("instruction_parse"):
+        steps = parse_recipe_instructions_batch(scraper.instructions_list(), lang)
+
+    return {
+        "title": scraper.title(),
+        "totalTime": scraper.total_time(),
+        "yields": scraper.yields(),
+        "ingredients": ingredients,
+        "steps": steps,
+        "image": scraper.image(),
+        "host": scraper.host()
+    }
+
+async def download_image(image_url: str) -> str:
+    """Downloads the image of a recipe and resizes it like uploaded images
+
+    Downloads bigger than FETCH_IMAGE_MAX_BYTES are aborted. Images the image store refuses, such as SVG, are left at
+    their URL so they do not fail the recipe.
+
+    Args:
+        image_url (str): URL of the image
+
+    Returns:
+        str: uri formatted base 64 image, URL of the image kept in the image store when IMAGE_STORE_PATH is set, or
+            image_url when the store refuses the image
+    """
+    with timed("image_fetch"):
+        mime, content = await fetch_image_content(image_url)
+
+    try:
+        return await run_in_threadpool(save_downloaded_image, mime, content, image_resize_mode.value)
+    except ValueError:
+        return image_url
+
+async def scrape_recipe(parse_request: ParseRequest) -> dict:
+    """Scrapes and parses a recipe from a website, serving it from the cache when possible
+
+    Concurrent requests for the same normalized URL share a single scrape and all get its result or error.
+
+    Args:
+        parse_request (ParseRequest): URL of the recipe and whether to download its image
+
+    Returns:
+        dictionary: title, totalTime, yields, ingredients list, instructions list, image, host
+    """
+    cache_key = f"{normalize_url(parse_request.url)}|{parse_request.downloadImage}"
+    cached = await call_cache(recipe_cache, "get", cache_key)
+    if cached is not None:
+        return cached
+
+    return await recipe_flights.run(cache_key, lambda: fetch_recipe(parse_request, cache_key))
+
+def store_recipe(key: str, recipe: dict):
+    """Keeps a recipe in the recipe store, logging instead of raising when it cannot be saved
+
+    A full disk or a locked database must not fail a recipe that was parsed. Images inline as base64 data URIs are
+    not kept, so the store does not grow by a whole image per recipe, while short URLs of the image store are.
+
+    Args:
+        key (str): identity of the recipe e.g. its normalized URL
+        recipe (dict): recipe in new json format
+    """
+    try:
+        if (recipe.get("image") or "").startswith("data:"):
+            recipe = { **recipe, "image": None }
+
+        with timed("store"):
+            recipe_store.save(key, recipe)
+    except Exception as e:
+        log_failed(logger, "Failed to store recipe", uuid4(), e, key=key)
+
+async def fetch_recipe(parse_request: ParseRequest, cache_key: str) -> dict:
+    """Scrapes and parses a recipe from a website, caches it and keeps it in the recipe store when enabled
+
+    The page and image are fetched without blocking a worker thread and the image download runs while the recipe is parsed.
+
+    Args:
+        parse_request (ParseRequest): URL of the recipe and whether to download its image
+        cache_key (str): recipe cache key
+
+    Returns:
+        dictionary: title, totalTime, yields, ingredients list, instructions list, image, host
+    """
+    with timed("html_fetch"):
+        html = await fetch_html(parse_request.url)
+
+    with timed("scrape"):
+        scraper = await run_in_threadpool(scrape_html, html, org_url=parse_request.url, wild_mode=True)
+
+    image_task = None
+    try:
+        if parse_request.downloadImage:
+            image_task = asyncio.create_task(download_image(scraper.image()))
+
+        result = await run_in_threadpool(parse_scraped_recipe, scraper)
+
+        if image_task:
+            result["image"] = await image_task
+    except Exception:
+        if image_task:
+            image_task.cancel()
+        raise
+
+    await call_cache(recipe_cache, "set", cache_key, result)
+
+    if recipe_store:
+        await run_in_threadpool(store_recipe, normalize_url(parse_request.url), result)
+
+    return result
 
 @app.post("/recipe/parse", response_model=Recipe)
-def parse_recipe(parse_request: ParseRequest):
+async def parse_recipe(parse_request: ParseRequest):
     """Parses a recipe from a website
 
     Raises:
@@ -54,90 +218,334 @@ def parse_recipe(parse_request: ParseRequest):
     correlation_id = uuid4()
     try:
         start = perf_counter()
-        logger.info(f"processing parse request id {correlation_id} for url: {parse_request.url}")
-        scraper = scrape_me(parse_request.url, wild_mode=True)
-        
-        lang = scraper.language() or "en"
-        
-        ingredients = map(lambda x: parse_recipe_ingredient(x, lang, ureg), scraper.ingredients())
-        instructions = map(lambda x: parse_recipe_instruction(x, lang), scraper.instructions_list())
-        
-        result = {
-            "title": scraper.title(),
-            "totalTime": scraper.total_time(),
-            "yields": scraper.yields(),
-            "ingredients": list(ingredients),
-            "steps": list(instructions),
-            "image": scraper.image(),
-            "host": scraper.host()
-        }
-        
-        if parse_request.downloadImage:
-            image_uri = parse_recipe_image(result["image"])
-            result["image"] = image_uri
 
-        return result
+        return await scrape_recipe(parse_request)
     except Exception as e:
-        logger.error(f"Failed to process parse request id {correlation_id}. Error: {e}")
+        log_failed(logger, "Failed to process parse request", correlation_id, e, url=parse_request.url)
         raise HTTPException(status_code=400, detail="Could not find a recipe in the web page")
     finally:
         end = perf_counter()
-        logger.info(f"Finished processing parse request id {correlation_id}. Time taken: {end - start:0.4f}s")
+        log_finished(logger, "Finished processing parse request", correlation_id, end - start, url=parse_request.url)
+        mark_handled()
+
+@app.post("/recipe/parse/batch")
+async def parse_recipe_batch(parse_requests: list[ParseRequest]):
+    """Parses recipes from many websites concurrently
+
+    Results are streamed as newline delimited JSON in the order they finish. Each line has the index and url of the
+    request and either the parsed recipe or an error, so a failing website does not fail the batch.
+
+    Raises:
+        HTTPException: when more than BATCH_MAX_ITEMS recipes are requested
+
+    Returns:
+        StreamingResponse: one line per request with index, url and recipe or error
+    """
+    if len(parse_requests) > batch_max_items:
+        raise HTTPException(status_code=400, detail=f"A batch can have at most {batch_max_items} recipes")
+
+    correlation_id = uuid4()
+
+    async def parse_item(index: int, parse_request: ParseRequest) -> dict:
+        try:
+            return { "index": index, "url": parse_request.url, "recipe": await scrape_recipe(parse_request) }
+        except Exception as e:
+            log_failed(logger, "Failed to process url of batch parse request", correlation_id, e, url=parse_request.url)
+            return { "index": index, "url": parse_request.url, "error": "Could not find a recipe in the web page" }
+
+    async def results():
+        start = perf_counter()
+        failed = 0
+        tasks = [asyncio.create_task(parse_item(index, item)) for index, item in enumerate(parse_requests)]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                item = await next_result
+                if "error" in item:
+                    failed += 1
+                yield dumps_line(item)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+            end = perf_counter()
+            log_finished(logger, "Finished processing batch parse request", correlation_id, end - start,
+                         urls=len(parse_requests), failed=failed)
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Reports per stage timings, requests in flight, request durations and errors by endpoint
+
+    Returns:
+        PlainTextResponse: metrics in Prometheus text format
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.post("/recipe/convert", response_model=Recipe)
+def convert_recipe(convert_request: ConvertRequest):
+    """Scales a parsed recipe and converts its ingredients to metric or US units
+
+    Volumes and masses are converted to the largest unit of the system the quantity reaches, e.g. 1000
+    milliliters are 1 liter and 48 teaspoons are 1 cup. Temperatures are neither converted nor scaled and the raw
+    text of the ingredients is kept as it is.
+
+    Raises:
+        HTTPException: when the scale is not greater than zero
+
+    Returns:
+        dictionary: the recipe with converted ingredient quantities and units
+    """
+    if convert_request.scale <= 0:
+        raise HTTPException(status_code=400, detail="The scale must be greater than zero")
+
+    system = convert_request.system.value if convert_request.system else None
+    with timed("convert"):
+        return convert_recipes([convert_request.recipe.model_dump()], get_unit_registry(), system, convert_request.scale)[0]
+
+@app.get("/recipe/search", response_model=list[Recipe])
+def search_recipes(q: str = "", ingredient: str = "", maxTime: Union[float, None] = None,
+                   limit: int = Query(20, ge=1, le=100), offset: int = Query(0, ge=0)):
+    """Searches the recipes parsed before, kept when RECIPE_STORE_PATH is set
+
+    Words are matched as prefixes ignoring case and accents, e.g. choc matches Chocolate. Recipes are sorted by
+    relevance when searching words and most recently parsed first otherwise.
+
+    Args:
+        q (str): words that must all be in the title or ingredients
+        ingredient (str): words that must all be in the ingredients
+        maxTime (float): longest total time in minutes, the sum of the step minutes when the recipe has no total time
+        limit (int): recipes returned, at most 100
+        offset (int): recipes skipped, to page through results
+
+    Raises:
+        HTTPException: when the recipe store is not enabled
+
+    Returns:
+        list: recipes in new json format
+    """
+    if recipe_store is None:
+        raise HTTPException(status_code=404, detail="Recipe search is not enabled")
+
+    with timed("search"):
+        return recipe_store.search(q, ingredient, maxTime, limit, offset)
+
+@app.get("/cache/stats")
+def cache_stats():
+    """Reports hit and miss counters of the parsed recipe and processed image caches
+
+    Returns:
+        dictionary: backend, hits, misses, hit ratio and size of each cache, None when a cache is disabled
+    """
+    return { "recipe": recipe_cache.stats() if recipe_cache else None, "image": image_cache_stats() }
+
+def parse_backup_recipe(recipe: dict, image: str) -> dict:
+    """Parses a recipe of a Sharp Cooking backup file into the new json format
+
+    Args:
+        recipe (dict): recipe as stored in the backup json
+        image (str): recipe image already processed into URI base64
+
+    Returns:
+        dictionary: title, totalTime, yields, ingredients list, instructions list, image, host, notes
+    """
+    with timed("ingredient_parse"):
+        ingredients = parse_recipe_ingredients(recipe["Ingredients"], get_unit_registry())
+
+    with timed("instruction_parse"):
+        steps = parse_recipe_instructions(recipe["Instructions"])
+
+    return {
+        "title": recipe["Title"],
+        "totalTime": 0,
+        "yields": "",
+        "ingredients": ingredients,
+        "steps": steps,
+        "image": image,
+        "host": "",
+        "notes": recipe["Notes"]
+    }
+
+def backup_recipe_fingerprint(zip: ZipFile, recipe: dict) -> str:
+    """Fingerprint of a recipe of a backup file, changes when the recipe or its image changes
+
+    The image is identified by the CRC and size stored in the zip so it does not have to be read.
+
+    Args:
+        zip (ZipFile): backup file containing the recipe image
+        recipe (dict): recipe as stored in the backup json
+
+    Returns:
+        str: sha256 of the recipe fields and image
+    """
+    image = zip.getinfo(recipe["MainImagePath"])
+    content = json.dumps([recipe["Title"], recipe["Ingredients"], recipe["Instructions"], recipe["Notes"],
+                          recipe["MainImagePath"], image.CRC, image.file_size])
+    return hashlib.sha256(content.encode()).hexdigest()
+
+def seekable_upload(file) -> BinaryIO:
+    """File of an upload that ZipFile can seek in
+
+    Before Python 3.11 SpooledTemporaryFile has no seekable method, which ZipFile needs to open members, so the
+    in-memory or on-disk file it wraps is used instead.
+
+    Args:
+        file (SpooledTemporaryFile): file of an UploadFile
+
+    Returns:
+        BinaryIO: seekable file with the upload content
+    """
+    if hasattr(file, "seekable"):
+        return file
+
+    return getattr(file, "_file", file)
+
+def parse_manifest(manifest: Union[str, None]) -> frozenset:
+    """Parses the fingerprints of the recipes a client already has
+
+    Args:
+        manifest (str): json array of fingerprints, None when not sent
+
+    Raises:
+        ValueError: when the manifest is not a json array of strings
+
+    Returns:
+        frozenset: fingerprints
+    """
+    if not manifest:
+        return frozenset()
+
+    fingerprints = json.loads(manifest)
+    if not isinstance(fingerprints, list) or not all(isinstance(item, str) for item in fingerprints):
+        raise ValueError("The manifest must be a json array of recipe fingerprints")
+
+    return frozenset(fingerprints)
+
+def iter_backup_recipes(zip: ZipFile, recipes: Iterator, resize_mode: ResizeMode,
+                        known: frozenset = frozenset()) -> Iterator[dict]:
+    """Parses the recipes of a backup file in order
+
+    When IMAGE_POOL_WORKERS is set images are decoded, resized and encoded in the image process pool ahead of the
+    recipe being yielded, while ingredients and instructions are parsed in the calling thread. Images processed
+    before, in this or another backup, are served from the image cache. Recipes whose fingerprint is known are skipped
+    without reading their image. Parsed recipes are kept in the recipe store, when enabled, under their fingerprint.
+
+    Args:
+        zip (ZipFile): backup file containing the recipe images
+        recipes (Iterator): recipes as stored in the backup json
+        resize_mode (ResizeMode): image resize speed and quality trade off
+        known (frozenset): fingerprints of the recipes the client already has
+
+    Returns:
+        Iterator[dict]: new or changed recipes in new json format with their fingerprint
+    """
+    recipes_in_flight = deque()
+    def images():
+        for recipe in recipes:
+            fingerprint = backup_recipe_fingerprint(zip, recipe)
+            if fingerprint in known:
+                continue
+
+            recipes_in_flight.append((recipe, fingerprint))
+            yield (recipe["MainImagePath"], zip.read(recipe["MainImagePath"]), True, resize_mode.value)
+
+    for image in parse_images(images()):
+        recipe, fingerprint = recipes_in_flight.popleft()
+        result = { **parse_backup_recipe(recipe, image), "fingerprint": fingerprint }
+        if recipe_store:
+            store_recipe(f"backup:{fingerprint}", result)
+
+        yield result
+
+def stream_backup_recipes(zip: ZipFile, recipes: Iterator, resize_mode: ResizeMode, known: frozenset,
+                          correlation_id: UUID) -> Iterator[bytes]:
+    """Parses the recipes of a backup file one at a time as newline delimited json
+
+    Args:
+        zip (ZipFile): backup file, closed once every recipe is parsed
+        recipes (Iterator): recipes as stored in the backup json
+        resize_mode (ResizeMode): image resize speed and quality trade off
+        known (frozenset): fingerprints of the recipes the client already has
+        correlation_id (UUID): id of the backup request
+
+    Returns:
+        Iterator[bytes]: one json line per recipe, or an error line when the backup cannot be read to the end
+    """
+    try:
+        start = perf_counter()
+        with zip:
+            for recipe in iter_backup_recipes(zip, recipes, resize_mode, known):
+                yield dumps_line(recipe)
+    except Exception as e:
+        log_failed(logger, "Failed to stream backup request", correlation_id, e)
+        yield dumps_line({ "error": "The backup file does not seem to be well formatted or generated by Sharp Cooking app" })
+    finally:
+        end = perf_counter()
+        log_finished(logger, "Finished streaming backup request", correlation_id, end - start)
 
 @app.post("/recipe/backup/parse", response_model=list[Recipe])
-def parse_backup(file: UploadFile):
+def parse_backup(file: UploadFile, stream: bool = False, resizeMode: Union[ResizeMode, None] = None,
+                 manifest: Union[str, None] = Form(None)):
     """Parses a Sharp Cooking backup file and return the recipes contained within in new json format
 
+    The zip is read straight from the uploaded file and the recipes json is decoded incrementally. With stream the
+    recipes are sent as newline delimited json as soon as each one is parsed, so memory is bounded by a single recipe.
+    Recipes are serialized as parsed, without validating them against the response model again.
+
+    Every recipe has a fingerprint. When re-importing, send the fingerprints of the recipes already imported as
+    manifest and only new or changed recipes are returned, unchanged ones are skipped without processing their image.
+
     Args:
         file (UploadFile): Backup file in zip
+        stream (bool): whether to stream recipes as newline delimited json, default is False
+        resizeMode (ResizeMode): image resize speed and quality trade off, default is IMAGE_RESIZE_MODE
+        manifest (str): form field with a json array of the fingerprints of the recipes the client already has
 
     Raises:
         HTTPException: if file uploaded is not a zip
 
     Returns:
-        _type_: _description_
+        FastJSONResponse: recipes in new json format, or a StreamingResponse with one recipe per line when streaming
     """    
 
     correlation_id = uuid4()
     try:
         start = perf_counter()
-        logger.info(f"processing backup request id {correlation_id}")
         
         if file.content_type != "application/x-zip-compressed" and file.content_type != "application/zip":
             raise HTTPException(status_code=400, detail="Only zip files are acceptted")
     
-        with ZipFile(io.BytesIO(file.file.read()), 'r') as zip:
-            json_file = zip.read("SharpBackup_Recipe.json")
-            json_content = json.load(io.BytesIO(json_file))
-            
-            result = []
-            for recipe in json_content:
-                image_file = zip.read(recipe["MainImagePath"])
-                result.append({
-                    "title": recipe["Title"],
-                    "totalTime": 0,
-                    "yields": "",
-                    "ingredients": parse_recipe_ingredients(recipe["Ingredients"], ureg),
-                    "steps": parse_recipe_instructions(recipe["Instructions"]),
-                    "image": parse_image(recipe["MainImagePath"], image_file, zip),
-                    "host": "",
-                    "notes": recipe["Notes"]
-                })
-
-        return result
+        resize_mode = resizeMode or image_resize_mode
+        known = parse_manifest(manifest)
+        zip = ZipFile(seekable_upload(file.file), 'r')
+        streaming = False
+        try:
+            json_file = io.TextIOWrapper(zip.open(BACKUP_RECIPES_FILE), encoding="utf-8-sig")
+            recipes = iter_json_array(json_file)
+
+            if stream:
+                streaming = True
+                return StreamingResponse(stream_backup_recipes(zip, recipes, resize_mode, known, correlation_id), media_type="application/x-ndjson")
+
+            return FastJSONResponse(list(iter_backup_recipes(zip, recipes, resize_mode, known)))
+        finally:
+            if not streaming:
+                zip.close()
     except Exception as e:
-        logger.error(f"Failed to process backup request id {correlation_id}. Error: {e}")
+        log_failed(logger, "Failed to process backup request", correlation_id, e)
         raise HTTPException(status_code=400, detail="The backup file does not seem to be well formatted or generated by Sharp Cooking app")
     finally:
         end = perf_counter()
-        logger.info(f"Finished processing backup request id {correlation_id}. Time taken: {end - start:0.4f}s")
+        log_finished(logger, "Finished processing backup request", correlation_id, end - start, stream=stream)
+        mark_handled()
 
 @app.post("/image/process", response_model=ImageResult)
-def parse_backup(file: UploadFile):
+def parse_backup(file: UploadFile, resizeMode: Union[ResizeMode, None] = None):
     """Processes an image and return a URI base64
 
     Args:
         file (UploadFile): image file
+        resizeMode (ResizeMode): resize speed and quality trade off, default is IMAGE_RESIZE_MODE
 
     Raises:
         HTTPException: if file uploaded is not an image
@@ -149,18 +557,46 @@ def parse_backup(file: UploadFile):
     correlation_id = uuid4()
     try:
         start = perf_counter()
-        logger.info(f"processing image request id {correlation_id}")
         
         if not file.content_type.startswith("image"):
             raise HTTPException(status_code=400, detail="Only image files are acceptted")
 
         return {
             "name": file.filename,
-            "image": parse_image(file.filename, file.file.read())
+            "image": parse_image_cached(file.filename, file.file.read(), True, (resizeMode or image_resize_mode).value)
         }
     except Exception as e:
-        logger.error(f"Failed to process image request id {correlation_id}. Error: {e}")
+        log_failed(logger, "Failed to process image request", correlation_id, e)
         raise HTTPException(status_code=400, detail="The image file is invalid")
     finally:
         end = perf_counter()
-        logger.info(f"Finished processing image request id {correlation_id}. Time taken: {end - start:0.4f}s")
+        log_finished(logger, "Finished processing image request", correlation_id, end - start)
+        mark_handled()
+
+@app.get("/image/{hash}")
+def get_image(hash: str, request: Request):
+    """Serves an image kept in the image store
+
+    Images are named after the hash of their content so they never change and can be cached forever. They are sent
+    with nosniff and a sandbox policy so a browser never runs them as a page of the API origin.
+
+    Args:
+        hash (str): sha256 of the image content
+        request (Request): request, checked for If-None-Match
+
+    Raises:
+        HTTPException: if the image is not stored
+
+    Returns:
+        FileResponse: the image file, or 304 when the client already has it
+    """
+    path = find_image(hash)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    headers = { "ETag": f'"{hash}"', "Cache-Control": "public, max-age=31536000, immutable",
+                "X-Content-Type-Options": "nosniff", "Content-Security-Policy": "sandbox" }
+    if headers["ETag"] in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
+    return FileResponse(path, media_type=blob_type(path), headers=headers)
@@ -0,0 +1,306 @@
+import bisect
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Iterator, Sequence
+from starlette.routing import Match
+
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+def format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    """Formats label pairs in Prometheus text format
+
+    Args:
+        names (Sequence[str]): label names
+        values (Sequence[str]): label values
+
+    Returns:
+        str: e.g. {stage="scrape"}, empty when there are no labels
+    """
+    if not names:
+        return ""
+
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+
+    return "{" + ",".join(pairs) + "}"
+
+def format_value(value: float) -> str:
+    """Formats a sample value in Prometheus text format
+
+    Args:
+        value (float): sample value
+
+    Returns:
+        str: integral values without decimals, +Inf for infinity
+    """
+    if value == float("inf"):
+        return "+Inf"
+
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class Counter:
+    """Monotonic counter with optional labels
+
+    Args:
+        name (str): metric name
+        help (str): metric description
+        label_names (Sequence[str]): label names, values are passed positionally to inc
+    """
+    type = "counter"
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1):
+        """Increments the counter
+
+        Args:
+            labels (str): label values
+            amount (float): increment, default is 1
+        """
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        """Current value
+
+        Args:
+            labels (str): label values
+
+        Returns:
+            float: value, 0 when never incremented
+        """
+        return self._values.get(labels, 0)
+
+    def samples(self) -> Iterator[str]:
+        """Sample lines in Prometheus text format
+
+        Returns:
+            Iterator[str]: one line per label values
+        """
+        with self._lock:
+            values = list(self._values.items())
+
+        for labels, value in values:
+            yield f"{self.name}{format_labels(self.label_names, labels)} {format_value(value)}"
+
+class Gauge(Counter):
+    """Value that goes up and down with optional labels
+
+    Args:
+        name (str): metric name
+        help (str): metric description
+        label_names (Sequence[str]): label names, values are passed positionally to inc and dec
+    """
+    type = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1):
+        """Decrements the gauge
+
+        Args:
+            labels (str): label values
+            amount (float): decrement, default is 1
+        """
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels: str, value: float):
+        """Sets the gauge
+
+        Args:
+            labels (str): label values
+            value (float): new value
+        """
+        with self._lock:
+            self._values[labels] = value
+
+class Histogram:
+    """Distribution of observed values in cumulative buckets with optional labels
+
+    Args:
+        name (str): metric name
+        help (str): metric description
+        label_names (Sequence[str]): label names, values are passed positionally to observe
+        buckets (Sequence[float]): upper bounds of the buckets in ascending order, +Inf is added
+    """
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = (), buckets: Sequence[float] = STAGE_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, *labels: str, value: float):
+        """Records a value
+
+        Args:
+            labels (str): label values
+            value (float): observed value e.g. seconds taken
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0, 0]
+
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, *labels: str) -> int:
+        """Values observed
+
+        Args:
+            labels (str): label values
+
+        Returns:
+            int: number of values observed
+        """
+        entry = self._values.get(labels)
+        return entry[2] if entry else 0
+
+    def samples(self) -> Iterator[str]:
+        """Sample lines in Prometheus text format
+
+        Returns:
+            Iterator[str]: cumulative bucket, sum and count lines per label values
+        """
+        with self._lock:
+            values = [(labels, (list(entry[0]), entry[1], entry[2])) for labels, entry in self._values.items()]
+
+        names = self.label_names + ("le",)
+        for labels, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket{format_labels(names, labels + (format_value(bound),))} {cumulative}"
+
+            yield f"{self.name}_sum{format_labels(self.label_names, labels)} {format_value(total)}"
+            yield f"{self.name}_count{format_labels(self.label_names, labels)} {count}"
+
+stage_seconds = Histogram("recipe_stage_seconds", "Seconds taken by each stage of processing a request", ["stage"])
+request_seconds = Histogram("http_request_duration_seconds", "Seconds taken to respond, including streamed bodies",
+                            ["endpoint"])
+requests_in_flight = Gauge("http_requests_in_flight", "Requests being processed", ["endpoint"])
+request_errors = Counter("http_request_errors_total", "Requests answered with an error status", ["endpoint", "status"])
+coalesced_calls = Counter("coalesced_calls_total", "Calls that joined an identical call already in flight", ["call"])
+admission_active = Gauge("admission_active", "Requests holding a slot of an endpoint with a concurrency limit",
+                         ["endpoint"])
+admission_queue_depth = Gauge("admission_queue_depth", "Requests waiting for a slot of an endpoint with a concurrency limit",
+                              ["endpoint"])
+admission_rejected = Counter("admission_rejected_total", "Requests rejected by admission control", ["endpoint", "reason"])
+
+METRICS = [stage_seconds, request_seconds, requests_in_flight, request_errors, coalesced_calls, admission_active,
+           admission_queue_depth, admission_rejected]
+
+_handled_at = ContextVar("handled_at", default=None)
+_stages = ContextVar("stages", default=None)
+
+def render_metrics() -> str:
+    """Renders every metric in Prometheus text format
+
+    Returns:
+        str: metrics exposition
+    """
+    lines = []
+    for metric in METRICS:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        lines.extend(metric.samples())
+
+    return "\n".join(lines) + "\n"
+
+@contextmanager
+def timed(stage: str):
+    """Records the seconds taken by the wrapped block in the stage histogram and the request stages, also when it fails
+
+    Args:
+        stage (str): stage name e.g. html_fetch
+    """
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = perf_counter() - start
+        stage_seconds.observe(stage, value=elapsed)
+        stages = _stages.get()
+        if stages is not None:
+            stages[stage] = stages.get(stage, 0) + elapsed
+
+def request_stages() -> dict:
+    """Seconds taken by each stage of the current request so far, added up when a stage ran more than once
+
+    Returns:
+        dictionary: stage to seconds, empty outside of a request
+    """
+    return { stage: round(seconds, 4) for stage, seconds in (_stages.get() or {}).items() }
+
+def mark_handled():
+    """Records that the endpoint of the current request returned, the time until the response starts is serialization"""
+    handled_at = _handled_at.get()
+    if handled_at is not None:
+        handled_at[0] = perf_counter()
+
+class MetricsMiddleware:
+    """ASGI middleware counting requests in flight, their duration and error responses by endpoint
+
+    Endpoints are labelled by route path e.g. /image/{hash} so labels stay bounded, unknown paths are labelled none.
+    When the endpoint calls mark_handled, the time until the response starts is recorded as the serialize stage.
+
+    Args:
+        app (ASGIApp): wrapped application
+        routes (list): routes of the application, matched in order
+    """
+
+    def __init__(self, app, routes: list):
+        self.app = app
+        self.routes = routes
+
+    def endpoint(self, scope: dict) -> str:
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match != Match.NONE:
+                return route.path
+
+        return "none"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        endpoint = self.endpoint(scope)
+        handled_at = [None]
+        token = _handled_at.set(handled_at)
+        stages_token = _stages.set({})
+        status = [500]
+
+        async def send_with_metrics(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                if handled_at[0] is not None:
+                    stage_seconds.observe("serialize", value=perf_counter() - handled_at[0])
+
+            await send(message)
+
+        start = perf_counter()
+        requests_in_flight.inc(endpoint)
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            requests_in_flight.dec(endpoint)
+            request_seconds.observe(endpoint, value=perf_counter() - start)
+            if status[0] >= 400:
+                request_errors.inc(endpoint, str(status[0]))
+
+            _handled_at.reset(token)
+            _stages.reset(stages_token)
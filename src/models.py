@@ -1,6 +1,21 @@
+from enum import Enum
 from pydantic import BaseModel
 from typing import Union
 
+class ResizeMode(str, Enum):
+    fast = "fast"
+    balanced = "balanced"
+    quality = "quality"
+
+class ImageFormat(str, Enum):
+    original = "original"
+    jpeg = "jpeg"
+    webp = "webp"
+
+class UnitSystem(str, Enum):
+    metric = "metric"
+    us = "us"
+
 class RecipeIngredient(BaseModel):
     raw: str
     quantity: float
@@ -19,11 +34,17 @@ class Recipe(BaseModel):
     image: Union[str, None] = None
     host: Union[str, None] = None
     notes: Union[str, None] = None
+    fingerprint: Union[str, None] = None
 
 class ParseRequest(BaseModel):
     url: str
     downloadImage: bool = False
 
+class ConvertRequest(BaseModel):
+    recipe: Recipe
+    system: Union[UnitSystem, None] = None
+    scale: float = 1
+
 class ImageResult(BaseModel):
     name: str
     image: str
\ No newline at end of file
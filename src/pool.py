@@ -0,0 +1,91 @@
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, Union
+
+image_pool_workers = int(os.getenv("IMAGE_POOL_WORKERS", "0"))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_image_pool() -> Union[ProcessPoolExecutor, None]:
+    """Gets the process pool used for CPU heavy image processing, created on first use
+
+    Returns:
+        ProcessPoolExecutor | None: the pool, None when IMAGE_POOL_WORKERS is 0 and images are processed in the request thread
+    """
+    global _pool
+    if image_pool_workers <= 0:
+        return None
+
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(image_pool_workers, mp_context=multiprocessing.get_context("spawn"))
+
+        return _pool
+
+def shutdown_image_pool():
+    """Shuts the image process pool down, a new one is created on next use"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+def image_pool_window() -> int:
+    """Images submitted to the image pool and not yet consumed by a single request
+
+    Returns:
+        int: twice the pool workers so workers never idle, 1 when the pool is disabled
+    """
+    return max(image_pool_workers * 2, 1)
+
+def submit_image_task(fn: Callable, *args) -> Future:
+    """Runs fn in the image process pool
+
+    Args:
+        fn (Callable): picklable function
+        args: fn arguments
+
+    Returns:
+        Future: fn result, already completed when the pool is disabled and fn ran in the calling thread
+    """
+    pool = get_image_pool()
+    if pool is not None:
+        return pool.submit(fn, *args)
+
+    future = Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as e:
+        future.set_exception(e)
+
+    return future
+
+def ordered_map(submit: Callable[..., Future], items: Iterable[tuple], window: int) -> Iterator:
+    """Submits every item and yields the results in the same order as the items
+
+    At most window items are in flight so large inputs are not read ahead into memory.
+
+    Args:
+        submit (Callable): called with the item unpacked as arguments, returns a future
+        items (Iterable[tuple]): arguments for each call
+        window (int): maximum items submitted and not yet yielded
+
+    Returns:
+        Iterator: results in item order
+    """
+    pending = deque()
+    try:
+        for item in items:
+            pending.append(submit(*item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
@@ -0,0 +1,165 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+from time import time
+from typing import Union
+
+FTS_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+def fts_query(text: str, column: Union[str, None] = None) -> str:
+    """Turns free text into an FTS5 query matching every word as a prefix
+
+    Words are quoted so characters with a meaning in FTS5 queries, like quotes or operators, are searched as text.
+
+    Args:
+        text (str): words to search for e.g. choc chip
+        column (str): column the words must be in, every indexed column when None
+
+    Returns:
+        str: FTS5 query e.g. "choc"* "chip"*, empty when the text has no words
+    """
+    prefix = f"{column} : " if column else ""
+    return " ".join(f'{prefix}"{word}"*' for word in FTS_TOKEN_RE.findall(text))
+
+class RecipeStore:
+    """Recipes parsed by the API kept in SQLite with a full-text index of their titles and ingredients
+
+    Recipes are stored whole as json next to searchable columns: the total time in minutes, taken from the recipe or
+    added up from its steps, and one row per ingredient with its quantity and canonical unit name. The database can be
+    shared by several worker processes.
+
+    Args:
+        path (str): SQLite database file
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+        with self._connection() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("""CREATE TABLE IF NOT EXISTS recipes (
+                id INTEGER PRIMARY KEY,
+                key TEXT NOT NULL UNIQUE,
+                title TEXT,
+                host TEXT,
+                total_minutes REAL NOT NULL,
+                recipe TEXT NOT NULL,
+                updated_at REAL NOT NULL)""")
+            connection.execute("CREATE INDEX IF NOT EXISTS recipes_total_minutes ON recipes (total_minutes)")
+            connection.execute("""CREATE TABLE IF NOT EXISTS recipe_ingredients (
+                recipe_id INTEGER NOT NULL REFERENCES recipes (id) ON DELETE CASCADE,
+                position INTEGER NOT NULL,
+                raw TEXT NOT NULL,
+                quantity REAL NOT NULL,
+                unit TEXT NOT NULL,
+                PRIMARY KEY (recipe_id, position))""")
+            connection.execute("CREATE INDEX IF NOT EXISTS recipe_ingredients_unit ON recipe_ingredients (unit)")
+            connection.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS recipes_fts USING fts5 (
+                title, ingredients, tokenize = 'unicode61 remove_diacritics 2')""")
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+            self._local.connection = connection
+
+        return connection
+
+    def save(self, key: str, recipe: dict):
+        """Stores a recipe, replacing the one stored with the same key
+
+        Args:
+            key (str): identity of the recipe e.g. its normalized URL
+            recipe (dict): recipe in new json format
+        """
+        with self._connection() as connection:
+            ingredients = recipe.get("ingredients") or []
+            total_minutes = recipe.get("totalTime") or sum(step["minutes"] for step in recipe.get("steps") or [])
+
+            row = connection.execute("SELECT id FROM recipes WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                connection.execute("DELETE FROM recipes_fts WHERE rowid = ?", row)
+                connection.execute("DELETE FROM recipe_ingredients WHERE recipe_id = ?", row)
+
+            connection.execute("""INSERT INTO recipes (key, title, host, total_minutes, recipe, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET title = excluded.title, host = excluded.host,
+                    total_minutes = excluded.total_minutes, recipe = excluded.recipe, updated_at = excluded.updated_at""",
+                (key, recipe.get("title"), recipe.get("host"), total_minutes, json.dumps(recipe), time()))
+            # RETURNING needs SQLite 3.35, older Python builds ship with earlier versions
+            id = row[0] if row is not None else connection.execute("SELECT id FROM recipes WHERE key = ?", (key,)).fetchone()[0]
+            connection.executemany("INSERT INTO recipe_ingredients (recipe_id, position, raw, quantity, unit) VALUES (?, ?, ?, ?, ?)",
+                                   [(id, position, item["raw"], item["quantity"], item["unit"])
+                                    for position, item in enumerate(ingredients)])
+            connection.execute("INSERT INTO recipes_fts (rowid, title, ingredients) VALUES (?, ?, ?)",
+                               (id, recipe.get("title") or "", "\n".join(item["raw"] for item in ingredients)))
+
+    def get(self, key: str) -> Union[dict, None]:
+        """Gets a stored recipe
+
+        Args:
+            key (str): identity of the recipe
+
+        Returns:
+            dict | None: recipe in new json format, None when not stored
+        """
+        row = self._connection().execute("SELECT recipe FROM recipes WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def search(self, text: str = "", ingredient: str = "", max_minutes: Union[float, None] = None, limit: int = 20,
+               offset: int = 0) -> list:
+        """Finds stored recipes, best matches first when searching text and most recently stored first otherwise
+
+        Args:
+            text (str): words that must all be in the title or ingredients, matched as prefixes
+            ingredient (str): words that must all be in the ingredients, matched as prefixes
+            max_minutes (float): longest total time in minutes
+            limit (int): recipes returned
+            offset (int): recipes skipped, to page through results
+
+        Returns:
+            list: recipes in new json format
+        """
+        match = " ".join(query for query in (fts_query(text), fts_query(ingredient, "ingredients")) if query)
+        conditions, parameters = [], []
+        if match:
+            conditions.append("recipes_fts MATCH ?")
+            parameters.append(match)
+        if max_minutes is not None:
+            conditions.append("recipes.total_minutes <= ?")
+            parameters.append(max_minutes)
+
+        if match:
+            query = "SELECT recipes.recipe FROM recipes_fts JOIN recipes ON recipes.id = recipes_fts.rowid"
+            order = "recipes_fts.rank"
+        else:
+            query = "SELECT recipes.recipe FROM recipes"
+            order = "recipes.updated_at DESC, recipes.id DESC"
+
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+
+        rows = self._connection().execute(f"{query} ORDER BY {order} LIMIT ? OFFSET ?", (*parameters, limit, offset))
+        return [json.loads(row[0]) for row in rows]
+
+def create_recipe_store(prefix: str) -> Union[RecipeStore, None]:
+    """Creates a recipe store configured through environment variables named after prefix
+
+    {prefix}_PATH enables the store in that SQLite database file.
+
+    Args:
+        prefix (str): environment variable prefix e.g. RECIPE_STORE
+
+    Returns:
+        RecipeStore | None: the store, None when {prefix}_PATH is not set
+    """
+    path = os.getenv(f"{prefix}_PATH", "")
+    if not path:
+        return None
+
+    return RecipeStore(path)
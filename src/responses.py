@@ -0,0 +1,48 @@
+import json
+from typing import Any
+from starlette.responses import JSONResponse
+
+# orjson is listed in requirements.txt, the standard json module is used when it is not installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def dumps(content: Any) -> bytes:
+    """Serializes content to compact UTF-8 json, with orjson when installed
+
+    Args:
+        content (Any): dictionaries, lists and json values
+
+    Returns:
+        bytes: json document
+    """
+    if orjson is not None:
+        return orjson.dumps(content)
+
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+def dumps_line(content: Any) -> bytes:
+    """Serializes content as a line of newline delimited json
+
+    Args:
+        content (Any): dictionaries, lists and json values
+
+    Returns:
+        bytes: json document followed by a new line
+    """
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_APPEND_NEWLINE)
+
+    return dumps(content) + b"\n"
+
+class FastJSONResponse(JSONResponse):
+    """JSON response serialized with orjson when installed
+
+    Endpoints return it for data the service built itself. FastAPI sends a returned response as it is, so the content
+    is not validated against the response_model and converted with jsonable_encoder again, and it must already match
+    the response model.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,192 @@
+import os
+import threading
+from typing import Union
+from pint import UnitRegistry
+
+COOKING_UNITS = os.path.join(os.path.dirname(__file__), "cooking_units.txt")
+
+unit_registry_units = os.getenv("UNIT_REGISTRY_UNITS", "full")
+unit_registry_cache = os.getenv("UNIT_REGISTRY_CACHE") or None
+
+_ureg = None
+_ureg_lock = threading.Lock()
+
+def create_unit_registry(units: str = "full", cache_folder: Union[str, None] = None) -> UnitRegistry:
+    """Creates a unit registry
+
+    Args:
+        units (str): full for every Pint unit or cooking for the units in cooking_units.txt, default is full
+        cache_folder (str): folder where Pint keeps the parsed definitions between runs, :auto: for the user cache
+            folder, None to parse them every time
+
+    Returns:
+        UnitRegistry: the registry
+    """
+    return UnitRegistry(COOKING_UNITS if units == "cooking" else "", cache_folder=cache_folder)
+
+def get_unit_registry() -> UnitRegistry:
+    """Gets the unit registry shared by the whole process, created on first use
+
+    UNIT_REGISTRY_UNITS and UNIT_REGISTRY_CACHE configure the registry as in create_unit_registry.
+
+    Returns:
+        UnitRegistry: the shared registry
+    """
+    global _ureg
+    if _ureg is None:
+        with _ureg_lock:
+            if _ureg is None:
+                _ureg = create_unit_registry(unit_registry_units, unit_registry_cache)
+
+    return _ureg
+
+# units a system converts to for each dimension, from the smallest, with the quantity from which each one is used
+SYSTEM_UNITS = {
+    "metric": [
+        [("milliliter", 0), ("liter", 1)],
+        [("gram", 0), ("kilogram", 1)],
+    ],
+    "us": [
+        [("teaspoon", 0), ("tablespoon", 1), ("cup", 0.25)],
+        [("ounce", 0), ("pound", 1)],
+    ],
+}
+
+class UnitConversions:
+    """Conversion factors from the units of parsed ingredients to the units of a system, computed once per unit
+
+    Every unit is converted to the smallest unit of its dimension in the system by a single factor, then to the
+    largest unit of that dimension the quantity reaches, e.g. 48 teaspoons are 1 cup. Units without a dimension in
+    the system are left as they are, and temperatures are neither converted nor scaled.
+
+    Args:
+        ureg (UnitRegistry): registry the ingredient units were parsed with
+        system (str): metric or us, None to only scale
+    """
+
+    def __init__(self, ureg: UnitRegistry, system: Union[str, None]):
+        self.ureg = ureg
+        self.system = system
+        self._ladders = []
+        for ladder in SYSTEM_UNITS.get(system, []):
+            base = ladder[0][0]
+            steps = []
+            for unit, minimum in ladder:
+                to_base = ureg.Quantity(1, unit).to(base).magnitude
+                steps.append((unit, minimum * to_base, 1 / to_base))
+            self._ladders.append((ureg.Unit(base).dimensionality, base, tuple(reversed(steps))))
+
+        self._factors = {}
+
+    def factor(self, unit: str) -> Union[tuple, None]:
+        """Conversion of a unit to the system
+
+        Args:
+            unit (str): canonical unit name e.g. cup
+
+        Returns:
+            tuple | None: factor to the smallest unit of the system, 0 for units not scaled, and the steps of larger
+                units, each with the minimum quantity in the smallest unit and the factor from it, None when the unit
+                is not converted
+        """
+        try:
+            return self._factors[unit]
+        except KeyError:
+            pass
+
+        conversion = None
+        if unit and unit in self.ureg:
+            dimensionality = self.ureg.Unit(unit).dimensionality
+            if "[temperature]" in dimensionality:
+                conversion = (0, ())
+
+            for ladder_dimensionality, base, steps in self._ladders:
+                if dimensionality == ladder_dimensionality:
+                    conversion = (self.ureg.Quantity(1, unit).to(base).magnitude, steps)
+                    break
+
+        self._factors[unit] = conversion
+        return conversion
+
+_conversions = {}
+
+def get_unit_conversions(ureg: UnitRegistry, system: Union[str, None]) -> UnitConversions:
+    """Gets the conversions to a system shared by the whole process for a registry
+
+    Args:
+        ureg (UnitRegistry): registry the ingredient units were parsed with
+        system (str): metric or us, None to only scale
+
+    Returns:
+        UnitConversions: the shared conversions
+    """
+    key = (id(ureg), system)
+    conversions = _conversions.get(key)
+    if conversions is None or conversions.ureg is not ureg:
+        conversions = _conversions[key] = UnitConversions(ureg, system)
+
+    return conversions
+
+def convert_ingredients(ingredients: list, ureg: UnitRegistry, system: Union[str, None] = None,
+                        scale: float = 1) -> list:
+    """Scales ingredients and converts them to a unit system in one pass
+
+    Conversion factors are looked up once per unit instead of building a Pint quantity per ingredient. The raw text
+    of the ingredients is kept as it is, and so is the unit of ingredients whose converted quantity would round to 0,
+    e.g. a pinch parsed as a picoinch.
+
+    Args:
+        ingredients (list): parsed ingredients with raw, quantity and unit, e.g. of many recipes
+        ureg (UnitRegistry): registry the units were parsed with
+        system (str): metric or us, None to keep the units
+        scale (float): factor quantities are multiplied by, default is 1
+
+    Returns:
+        list: ingredients with raw, quantity and unit
+    """
+    factor = get_unit_conversions(ureg, system).factor
+
+    result = []
+    for ingredient in ingredients:
+        quantity = ingredient["quantity"]
+        unit = ingredient["unit"]
+        conversion = factor(unit)
+        if conversion is None:
+            quantity *= scale
+        elif conversion[0]:
+            quantity *= scale
+            converted = quantity * conversion[0]
+            for to_name, minimum, to_unit in conversion[1]:
+                if converted >= minimum:
+                    converted *= to_unit
+                    break
+
+            if round(converted, 2) or not quantity:
+                quantity, unit = converted, to_name
+
+        result.append({ "raw": ingredient["raw"], "quantity": round(quantity, 2), "unit": unit })
+
+    return result
+
+def convert_recipes(recipes: list, ureg: UnitRegistry, system: Union[str, None] = None, scale: float = 1) -> list:
+    """Scales recipes and converts their ingredients to a unit system in a single batch
+
+    Args:
+        recipes (list): recipes in new json format
+        ureg (UnitRegistry): registry the units were parsed with
+        system (str): metric or us, None to keep the units
+        scale (float): factor quantities are multiplied by, default is 1
+
+    Returns:
+        list: recipes with converted ingredients
+    """
+    ingredients = convert_ingredients([item for recipe in recipes for item in recipe["ingredients"]], ureg, system, scale)
+
+    result = []
+    start = 0
+    for recipe in recipes:
+        end = start + len(recipe["ingredients"])
+        result.append({ **recipe, "ingredients": ingredients[start:end] })
+        start = end
+
+    return result
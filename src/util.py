@@ -1,12 +1,14 @@
 import io
+import json
+import weakref
+from typing import Iterable, Iterator, TextIO, Union
 from zipfile import ZipFile
 from recipe_scrapers import scrape_me
 from fractions import Fraction
 import re
-import requests
 import base64
 import mimetypes
-from PIL import Image
+from PIL import Image, ImageOps
 from pint import UnitRegistry
 
 def parse_recipe_ingredients(text: str, ureg: UnitRegistry):
@@ -18,56 +20,229 @@ def parse_recipe_ingredients(text: str, ureg: UnitRegistry):
     Returns:
         list: list of ingredients with raw, unit, and quantity
     """
-    ingredients = text.split("\n")
-    
-    result = []
-    for ingredient in ingredients:
-        result.append(parse_recipe_ingredient(ingredient, "en", ureg))
-    
-    return result
+    return parse_recipe_ingredients_batch(text.split("\n"), "en", ureg)
 
-def parse_recipe_instructions(text: str):
+def parse_recipe_instructions(text: str, lang: str = "en"):
     """Parses a recipe collection of instructions that are formatted in a single string separated by \n
 
     Args:
         text (str): instructions
+        lang (str): language the instructions are in, default is en
 
     Returns:
         list: list of instructions with raw and time
     """    
-    instructions = text.split("\n")
-    
-    result = []
-    for instruction in instructions:
-        if instruction != "":
-            result.append(parse_recipe_instruction(instruction, "en"))
-    
-    return result    
+    instructions = [instruction for instruction in text.split("\n") if instruction != ""]
+    return parse_recipe_instructions_batch(instructions, lang)
+
+RESIZE_MODES = {
+    # decode JPEGs at the smallest DCT scale still larger than the target, then a cheap filter
+    "fast": (Image.Resampling.BILINEAR, 1.0),
+    # decode JPEGs at a DCT scale at least twice the target, then LANCZOS
+    "balanced": (Image.Resampling.LANCZOS, 2.0),
+    # decode at native resolution, then LANCZOS
+    "quality": (Image.Resampling.LANCZOS, None),
+}
+
+# output formats converted to: mime type and Pillow save options
+OUTPUT_FORMATS = {
+    "jpeg": ("image/jpeg", { "format": "jpeg", "progressive": True, "optimize": True }),
+    "webp": ("image/webp", { "format": "webp", "method": 4 }),
+}
+OUTPUT_QUALITY = 85
+MIN_OUTPUT_QUALITY = 30
+MIN_OUTPUT_SIZE = 64
 
-def parse_image(name: str, image: bytes, resize: bool = True) -> str:
+def parse_image(name: str, image: bytes, resize: bool = True, mode: str = "balanced", format: str = "original",
+                quality: Union[int, None] = None, max_bytes: int = 0) -> str:
     """Extracts an image from a backup file and convert to uri format
 
     Args:
         name (str): file name
         image (bytes): backup file
         resize (bool): whether to resize the image or not, default is True
+        mode (str): resize speed and quality trade off, one of fast, balanced or quality, default is balanced
+        format (str): output format, one of original, jpeg or webp, default is original
+        quality (int): encoder quality of lossy formats, None for the default
+        max_bytes (int): size the encoded image should fit in, 0 for no limit
 
     Returns:
         str: uri formatted base 64 file
     """
-    mime = mimetypes.MimeTypes().guess_type(name)[0]
+    return to_data_uri(*process_image(name, image, resize, mode, format, quality, max_bytes))
+
+def process_image(name: str, image: bytes, resize: bool = True, mode: str = "balanced", format: str = "original",
+                  quality: Union[int, None] = None, max_bytes: int = 0) -> tuple:
+    """Resizes an image and encodes it in the format of its file name, progressive JPEG or WebP
+
+    When format is original and the file name has no known image type, the format the image was decoded from is kept,
+    and images in a format Pillow cannot write are encoded as progressive JPEG. The EXIF orientation is applied to the
+    pixels and EXIF metadata is not written. With max_bytes the quality of lossy formats is lowered down to
+    MIN_OUTPUT_QUALITY, then the image is scaled down, until it fits.
+
+    Args:
+        name (str): file name, its extension decides the output format when format is original
+        image (bytes): image content
+        resize (bool): whether to resize the image or not, default is True
+        mode (str): resize speed and quality trade off, one of fast, balanced or quality, default is balanced
+        format (str): output format, one of original, jpeg or webp, default is original
+        quality (int): encoder quality of lossy formats, None for the default
+        max_bytes (int): size the encoded image should fit in, 0 for no limit
+
+    Returns:
+        tuple: mime type and encoded image
+    """
     image_open = Image.open(io.BytesIO(image))
-    
-    format = mime.lower().replace("image/", "")
-    
-    buffered = io.BytesIO()
+    source_format = image_open.format
     if resize:
-        image_open.thumbnail((1024, 1024), Image.Resampling.LANCZOS)
-        image_open.save(buffered, format=format)
-    else:
-        image_open.save(buffered, format=format)
-        
-    return ("data:" +  mime + ";" + "base64," + base64.b64encode(buffered.getvalue()).decode())
+        resample, reducing_gap = RESIZE_MODES[mode]
+        image_open.thumbnail((1024, 1024), resample, reducing_gap)
+
+    ImageOps.exif_transpose(image_open, in_place=True)
+
+    if format not in OUTPUT_FORMATS:
+        mime = mimetypes.MimeTypes().guess_type(name)[0] or Image.MIME.get(source_format)
+        original_format = mime.lower().replace("image/", "") if mime else ""
+        Image.init()
+        if original_format.upper() in Image.SAVE:
+            return mime, encode_image(image_open, { "format": original_format }, quality, max_bytes)
+
+        format = "jpeg"
+
+    mime, options = OUTPUT_FORMATS[format]
+    image_open = convert_for_format(image_open, options["format"])
+    quality = quality or OUTPUT_QUALITY
+
+    return mime, encode_image(image_open, options, quality, max_bytes)
+
+def convert_for_format(image: Image.Image, format: str) -> Image.Image:
+    """Converts an image to a mode the output format supports, flattening transparency on white for JPEG
+
+    Args:
+        image (Image): decoded image
+        format (str): jpeg or webp
+
+    Returns:
+        Image: the image in RGB, or RGBA for WebP with transparency
+    """
+    has_alpha = image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info)
+    if format == "webp" and has_alpha:
+        return image.convert("RGBA")
+
+    if has_alpha:
+        rgba = image.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+
+    return image if image.mode == "RGB" else image.convert("RGB")
+
+def encode_image(image: Image.Image, options: dict, quality: Union[int, None], max_bytes: int) -> bytes:
+    """Encodes an image, lowering quality and then size until it fits in max_bytes
+
+    Args:
+        image (Image): decoded image
+        options (dict): Pillow save options including the format
+        quality (int): encoder quality, None for the default and for lossless formats
+        max_bytes (int): size the encoded image should fit in, 0 for no limit
+
+    Returns:
+        bytes: encoded image, the smallest attempt when it cannot fit
+    """
+    def save(image: Image.Image, quality: Union[int, None]) -> bytes:
+        buffered = io.BytesIO()
+        image.save(buffered, **options, **({ "quality": quality } if quality else {}))
+        return buffered.getvalue()
+
+    content = save(image, quality)
+    if not max_bytes or len(content) <= max_bytes:
+        return content
+
+    lossy = options["format"] in ("jpeg", "webp")
+    if lossy:
+        # highest quality that fits, found with a binary search
+        low, high = MIN_OUTPUT_QUALITY, (quality or 75) - 1
+        best = None
+        while low <= high:
+            middle = (low + high) // 2
+            attempt = save(image, middle)
+            if len(attempt) <= max_bytes:
+                best, low = attempt, middle + 1
+            else:
+                content, high = attempt, middle - 1
+
+        if best is not None:
+            return best
+
+    while len(content) > max_bytes and min(image.size) > MIN_OUTPUT_SIZE:
+        image = image.resize((max(image.width * 3 // 4, 1), max(image.height * 3 // 4, 1)), Image.Resampling.LANCZOS)
+        content = save(image, MIN_OUTPUT_QUALITY if lossy else None)
+
+    return content
+
+def to_data_uri(mime: str, content: bytes) -> str:
+    """Formats binary content in URI and base64
+
+    Args:
+        mime (str): content type e.g. image/jpeg
+        content (bytes): content to encode
+
+    Returns:
+        str: uri formatted base 64 content
+    """
+    return "data:" + mime + ";" + "base64," + base64.b64encode(content).decode()
+
+UNICODE_FRACTIONS = {
+    "½": "1/2", "⅓": "1/3", "⅔": "2/3", "¼": "1/4", "¾": "3/4", "⅕": "1/5", "⅖": "2/5", "⅗": "3/5", "⅘": "4/5",
+    "⅙": "1/6", "⅚": "5/6", "⅐": "1/7", "⅛": "1/8", "⅜": "3/8", "⅝": "5/8", "⅞": "7/8", "⅑": "1/9", "⅒": "1/10",
+    "↉": "0/3", "⁄": "/"
+}
+UNICODE_FRACTIONS_TABLE = str.maketrans(UNICODE_FRACTIONS)
+MIXED_FRACTION_RE = re.compile(r"(\d)(?=[½⅓⅔¼¾⅕⅖⅗⅘⅙⅚⅐⅛⅜⅝⅞⅑⅒↉])")
+INGREDIENT_RE = re.compile(r"^(?P<Value>\d{1,5}\s\d{1,5}\/\d{1,5}|\d{1,5}\/\d{1,5}|\d{1,5}\.?\d{0,5})\d*\s?(?P<Unit>\w*\b)")
+UNIT_NAME_RE = re.compile(r"\w+")
+UNIT_ALIASES_LIMIT = 10000
+
+_unit_aliases = weakref.WeakKeyDictionary()
+
+def get_unit_aliases(ureg: UnitRegistry) -> dict:
+    """Gets the alias to canonical unit name table of a registry, built once per registry
+
+    The table starts with every unit name, symbol and alias defined in the registry. Other words such as plurals or
+    prefixed units are resolved through Pint the first time they are seen and remembered, including words that are
+    not units.
+
+    Args:
+        ureg (UnitRegistry): unit registry
+
+    Returns:
+        dictionary: word to canonical unit name, empty string for words that are not units
+    """
+    aliases = _unit_aliases.get(ureg)
+    if aliases is None:
+        aliases = { name: definition.name for name, definition in ureg._units.items() if UNIT_NAME_RE.fullmatch(name) }
+        _unit_aliases[ureg] = aliases
+
+    return aliases
+
+def resolve_unit(unit: str, aliases: dict, ureg: UnitRegistry) -> str:
+    """Resolves a word to its canonical unit name
+
+    Args:
+        unit (str): word following the quantity e.g. grams
+        aliases (dict): alias table of the registry from get_unit_aliases
+        ureg (UnitRegistry): unit registry used for words not in the table
+
+    Returns:
+        str: canonical unit name e.g. gram, empty string when the word is not a unit
+    """
+    result = aliases.get(unit)
+    if result is None:
+        result = ureg.get_name(unit) if unit and unit in ureg else ""
+        if len(aliases) < UNIT_ALIASES_LIMIT:
+            aliases[unit] = result
+
+    return result
 
 def parse_recipe_ingredient(text: str, lang: str, ureg: UnitRegistry):
     """Parses a single recipe ingredient
@@ -79,51 +254,158 @@ def parse_recipe_ingredient(text: str, lang: str, ureg: UnitRegistry):
     Returns:
         dictionary: raw text, quantity parsed, unit identified
     """
-    text = replace_unicode_fractions(text)
-    qty_re = re.search(r"^(?P<Value>\d{1,5}\s\d{1,5}\/\d{1,5}|\d{1,5}\/\d{1,5}|\d{1,5}\.?\d{0,5})\d*\s?(?P<Unit>\w*\b)",
-                    text)
-
-    if not qty_re:
-        return { "raw": text, "quantity": 0, "unit": "" }
-
-    value = qty_re.group("Value")
-    unit = qty_re.group("Unit")
-    
-    unit_value = ""
-    if unit and unit in ureg:
-        unit_value = ureg.get_name(unit)
-
-    parts = value.split(" ")
-    
-    if parts.__len__() == 2:
-        whole = int(parts[0])
-        fraction = Fraction(parts[1])
-        return { "raw": text, "quantity": whole + float(fraction).__round__(2), "unit": unit_value }
-    
-    if parts[0].count("/") == 1:
-        fraction = Fraction(parts[0])
-        return { "raw": text, "quantity": float(fraction).__round__(2), "unit": unit_value }
-        
-    regular = parts[0]
-    return { "raw": text, "quantity": float(regular), "unit": unit_value }
+    return parse_recipe_ingredients_batch([text], lang, ureg)[0]
+
+def parse_recipe_ingredients_batch(ingredients: Iterable[str], lang: str, ureg: UnitRegistry) -> list:
+    """Parses many recipe ingredients in one pass
+
+    Args:
+        ingredients (Iterable[str]): the ingredients e.g. 10 grams flour
+        lang (str): language the ingredients are in
+        ureg (UnitRegistry): unit registry used to identify units
+
+    Returns:
+        list: list of ingredients with raw, unit, and quantity
+    """
+    aliases = get_unit_aliases(ureg)
+    match = INGREDIENT_RE.match
+
+    result = []
+    for text in ingredients:
+        text = replace_unicode_fractions(text)
+        qty_re = match(text)
+
+        if not qty_re:
+            result.append({ "raw": text, "quantity": 0, "unit": "" })
+            continue
+
+        value = qty_re.group("Value")
+        unit_value = resolve_unit(qty_re.group("Unit"), aliases, ureg)
+
+        whole, _, fraction = value.partition(" ")
+        if fraction:
+            quantity = int(whole) + float(Fraction(fraction)).__round__(2)
+        elif "/" in whole:
+            quantity = float(Fraction(whole)).__round__(2)
+        else:
+            quantity = float(whole)
+
+        result.append({ "raw": text, "quantity": quantity, "unit": unit_value })
+
+    return result
 
 def replace_unicode_fractions(text: str):
     """Replaces unicode based fraction values such as ½ with string fractions such as 1/2
 
+    A fraction following a digit such as 1½ is separated by a space so it reads 1 1/2.
+
     Args:
         text (str): text to search for fractions
 
     Returns:
         str: text with replaced fractions
     """    
-    result = text.replace("½", "1/2")
-    result = result.replace("¼", "1/4")
-    result = result.replace("¾", "3/4")
-    result = result.replace("⅓", "1/3")
-    result = result.replace("⅔", "2/3")
+    result = text.translate(UNICODE_FRACTIONS_TABLE)
+
+    # fractions are longer than the characters they replace
+    if len(result) != len(text):
+        result = MIXED_FRACTION_RE.sub(r"\1 ", text).translate(UNICODE_FRACTIONS_TABLE)
 
     return result
 
+SECOND, MINUTE, HOUR, DAY = 1 / 60, 1, 60, 24 * 60
+
+DURATION_UNITS = {
+    "en": { "seconds": SECOND, "second": SECOND, "secs": SECOND, "sec": SECOND,
+            "minutes": MINUTE, "minute": MINUTE, "mins": MINUTE, "min": MINUTE,
+            "hours": HOUR, "hour": HOUR, "hrs": HOUR, "hr": HOUR, "h": HOUR,
+            "days": DAY, "day": DAY },
+    "pt": { "segundos": SECOND, "segundo": SECOND, "seg": SECOND, "minutos": MINUTE, "minuto": MINUTE,
+            "horas": HOUR, "hora": HOUR, "dias": DAY, "dia": DAY },
+    "es": { "segundos": SECOND, "segundo": SECOND, "seg": SECOND, "minutos": MINUTE, "minuto": MINUTE,
+            "horas": HOUR, "hora": HOUR, "días": DAY, "día": DAY, "dias": DAY, "dia": DAY },
+    "fr": { "secondes": SECOND, "seconde": SECOND, "minutes": MINUTE, "minute": MINUTE,
+            "heures": HOUR, "heure": HOUR, "jours": DAY, "jour": DAY },
+    "de": { "sekunden": SECOND, "sekunde": SECOND, "sek": SECOND, "minuten": MINUTE, "minute": MINUTE,
+            "stunden": HOUR, "stunde": HOUR, "std": HOUR, "tage": DAY, "tagen": DAY, "tag": DAY },
+    "it": { "secondi": SECOND, "secondo": SECOND, "minuti": MINUTE, "minuto": MINUTE,
+            "ore": HOUR, "ora": HOUR, "giorni": DAY, "giorno": DAY },
+}
+DURATION_RANGES = { "en": ["to"], "pt": ["a", "até"], "es": ["a"], "fr": ["à"], "de": ["bis"], "it": ["a"] }
+DURATION_NUMBER = r"\d{1,5}(?:[.,]\d{1,5}|/\d{1,5}|\s\d{1,5}/\d{1,5})?"
+
+_duration_extractors = {}
+
+def get_duration_extractor(lang: str) -> tuple:
+    """Gets the compiled duration pattern and unit table of a language, built once per language
+
+    Words of the language are recognized together with the English ones, unknown languages use English only. The
+    pattern matches any word after a number and the caller looks it up in the unit table, which is much cheaper than
+    an alternation of every unit word.
+
+    Args:
+        lang (str): language e.g. en or pt-BR
+
+    Returns:
+        tuple: compiled pattern and unit word to minutes table
+    """
+    lang = re.split(r"[-_]", (lang or "en").lower())[0]
+    extractor = _duration_extractors.get(lang)
+    if extractor is None:
+        units = { **DURATION_UNITS["en"], **DURATION_UNITS.get(lang, {}) }
+        ranges = dict.fromkeys(["-", "–", *DURATION_RANGES["en"], *DURATION_RANGES.get(lang, [])])
+        pattern = re.compile(
+            rf"(?<![\d.,/])(?P<Value>{DURATION_NUMBER})"
+            rf"(?:\s*(?:{'|'.join(map(re.escape, ranges))})\s*(?P<Upper>{DURATION_NUMBER}))?"
+            r"\s*(?P<Unit>[^\W\d_]+)\b")
+        extractor = _duration_extractors[lang] = (pattern, units)
+
+    return extractor
+
+def parse_duration_number(value: str) -> float:
+    """Parses a number as written in a recipe
+
+    Args:
+        value (str): e.g. 10, 1.5, 1,5, 1/2 or 1 1/2
+
+    Returns:
+        float: the number
+    """
+    whole, _, fraction = value.partition(" ")
+    if fraction:
+        return int(whole) + float(Fraction(fraction))
+
+    if "/" in whole:
+        return float(Fraction(whole))
+
+    return float(whole.replace(",", "."))
+
+def parse_duration_range(value: str, upper: str) -> float:
+    """Parses a duration number or range as written in a recipe, using the upper bound of ranges
+
+    A whole number followed by a smaller fraction is a mixed number in US notation, e.g. 1-1/2 is 1½. Other ranges
+    whose upper bound is smaller than the lower one use the lower bound.
+
+    Args:
+        value (str): number or lower bound of the range e.g. 10 or 1
+        upper (str): upper bound of the range e.g. 15 or 1/2, empty when not a range
+
+    Returns:
+        float: the number, or upper bound of the range
+    """
+    lower = parse_duration_number(value)
+    if not upper:
+        return lower
+
+    higher = parse_duration_number(upper)
+    if higher >= lower:
+        return higher
+
+    if lower.is_integer() and "/" in upper and " " not in upper and higher < 1:
+        return lower + higher
+
+    return lower
+
 def parse_recipe_instruction(text: str, lang: str):
     """Parses a single recipe instruction
 
@@ -134,25 +416,110 @@ def parse_recipe_instruction(text: str, lang: str):
     Returns:
         dictionary: raw instruction, minutes identified for the instruction
     """    
-    qty_re = re.findall(r"(?P<Minutes>\d{1,5}\.?\d{0,5})\s*(minutes|minute|min)\b|(?P<Hours>\d{1,5}\.?\d{0,5})\s*(hours|hour)\b|(?P<Days>\d{1,5}\.?\d{0,5})\s*(days|day)\b",
-                    text)
-    minutes = 0
-    
-    for match in qty_re:
-        minutes += float(match[0] or "0")
-        minutes += float(match[2] or "0") * 60
-        minutes += float(match[4] or "0") * 24 * 60
-    
-    return { "raw": text, "minutes": minutes }
+    return parse_recipe_instructions_batch([text], lang)[0]
 
-def parse_recipe_image(image_url: str):
-    """Pulls an image from a web server and formats the result in URI and base64
+def parse_recipe_instructions_batch(instructions: Iterable[str], lang: str) -> list:
+    """Parses many recipe instructions in one pass, adding up every duration found in each
+
+    Durations may be in seconds, minutes, hours or days, abbreviated (hr, mins), fractional (1½ hours) or a range
+    (10-15 minutes), in which case the upper bound is used. 1-1/2 hours is read as 1½ hours, not as a range.
 
     Args:
-        image_url (str): URL of the image to pull
+        instructions (Iterable[str]): the instructions e.g. knead dough for 10 minutes
+        lang (str): language the instructions are in
 
     Returns:
-        str: URI in base64
-    """    
-    response = requests.get(image_url)
-    return ("data:" +  response.headers['Content-Type'] + ";" + "base64," + base64.b64encode(response.content).decode("utf-8"))
\ No newline at end of file
+        list: list of instructions with raw and minutes
+    """
+    pattern, units = get_duration_extractor(lang)
+    findall = pattern.findall
+
+    result = []
+    for text in instructions:
+        minutes = 0
+        for value, upper, unit in findall(text if text.isascii() else replace_unicode_fractions(text)):
+            unit = units.get(unit.lower())
+            if unit is not None:
+                minutes += parse_duration_range(value, upper) * unit
+
+        result.append({ "raw": text, "minutes": round(minutes, 2) })
+
+    return result
+
+JSON_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+def iter_json_array(stream: TextIO, chunk_size: int = 65536) -> Iterator:
+    """Iterates the items of a JSON array one at a time without loading the whole document
+
+    Items must be separated by exactly one comma and only whitespace may follow the closing bracket, like json.load.
+
+    Args:
+        stream (TextIO): text stream containing a JSON array
+        chunk_size (int): characters read from the stream at a time
+
+    Raises:
+        ValueError: when the stream does not contain a JSON array
+
+    Returns:
+        Iterator: the array items
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    eof = False
+    # what comes next: the opening bracket, the first item or the closing bracket, an item, a comma or the closing
+    # bracket, or nothing once the array is closed
+    expected = "open"
+
+    while True:
+        position = JSON_WHITESPACE.match(buffer, position).end()
+        item, end = None, None
+
+        if position < len(buffer):
+            char = buffer[position]
+            if expected == "closed":
+                raise ValueError("Extra data after the JSON array")
+
+            if expected == "open":
+                if char != "[":
+                    raise ValueError("Expected a JSON array")
+
+                expected = "first"
+                position += 1
+                continue
+
+            if char == "]" and expected in ("first", "separator"):
+                expected = "closed"
+                position += 1
+                continue
+
+            if expected == "separator":
+                if char != ",":
+                    raise ValueError("Expected , or ] between the items of the JSON array")
+
+                expected = "item"
+                position += 1
+                continue
+
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+        elif eof:
+            if expected == "closed":
+                return
+
+            raise ValueError("Expected a JSON array" if expected == "open" else "Unterminated JSON array")
+
+        # an item ending at the buffer end may be a truncated number, read more before trusting it
+        if end is None or (end == len(buffer) and not eof):
+            chunk = stream.read(max(chunk_size, len(buffer) - position))
+            eof = chunk == ""
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+
+        yield item
+        position = end
+        expected = "separator"
@@ -0,0 +1,27 @@
+import io
+import json
+from zipfile import ZipFile
+from PIL import Image
+
+def create_backup(sizes: list) -> bytes:
+    """Builds a Sharp Cooking backup with one recipe per image size
+
+    Args:
+        sizes (list): width and height of the image of each recipe
+
+    Returns:
+        bytes: zip content
+    """
+    recipes = []
+    buffer = io.BytesIO()
+    with ZipFile(buffer, "w") as zip:
+        for index, size in enumerate(sizes):
+            image = io.BytesIO()
+            Image.new("RGB", size, (index * 40, 100, 150)).save(image, format="jpeg")
+            zip.writestr(f"{index}.jpeg", image.getvalue())
+            recipes.append({ "Title": f"Recipe {index}", "Ingredients": "1 cup sugar", "Instructions": "Bake for 10 minutes",
+                             "Notes": "", "MainImagePath": f"{index}.jpeg" })
+
+        zip.writestr("SharpBackup_Recipe.json", json.dumps(recipes))
+
+    return buffer.getvalue()
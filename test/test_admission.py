@@ -0,0 +1,125 @@
+import asyncio
+import httpx
+from fastapi import FastAPI, Request
+from src.admission import AdmissionLimit, AdmissionMiddleware, create_admission_limit
+from src.metrics import admission_queue_depth, admission_rejected
+
+def create_app(limit: AdmissionLimit, started: list, release: asyncio.Event) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/work")
+    async def work(request: Request):
+        body = await request.body()
+        started.append(len(body))
+        await release.wait()
+        return { "bytes": len(body) }
+
+    app.add_middleware(AdmissionMiddleware, limits={ "/work": limit })
+    return app
+
+def test_admission_limit_queues_in_order():
+    order = []
+    async def request(limit, name):
+        assert await limit.acquire()
+        order.append(name)
+        await asyncio.sleep(0.01)
+        limit.release()
+
+    async def run():
+        limit = AdmissionLimit("test_order", 1, queue_size=5)
+        await asyncio.gather(*[request(limit, name) for name in "abcd"])
+        return limit
+
+    limit = asyncio.run(run())
+    assert order == list("abcd")
+    assert limit.active == 0
+    assert limit.waiting() == 0
+
+def test_admission_limit_rejects_when_queue_full():
+    async def run():
+        limit = AdmissionLimit("test_full", 1, queue_size=1)
+        assert await limit.acquire()
+        waiter = asyncio.create_task(limit.acquire())
+        await asyncio.sleep(0)
+        assert limit.waiting() == 1
+        assert admission_queue_depth.value("test_full") == 1
+        assert not await limit.acquire()
+        limit.release()
+        assert await waiter
+        assert limit.active == 1
+
+    asyncio.run(run())
+    assert admission_rejected.value("test_full", "queue_full") == 1
+
+def test_admission_limit_timeout():
+    async def run():
+        limit = AdmissionLimit("test_timeout", 1, queue_size=1, timeout=0.01)
+        assert await limit.acquire()
+        assert not await limit.acquire()
+        assert limit.waiting() == 0
+        limit.release()
+        assert limit.active == 0
+
+    asyncio.run(run())
+    assert admission_rejected.value("test_timeout", "timeout") == 1
+
+def test_admission_limit_cancelled_waiter():
+    async def run():
+        limit = AdmissionLimit("test_cancel", 1, queue_size=1)
+        assert await limit.acquire()
+        waiter = asyncio.create_task(limit.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        limit.release()
+        assert limit.active == 0
+        assert admission_queue_depth.value("test_cancel") == 0
+
+    asyncio.run(run())
+
+def test_create_admission_limit(monkeypatch):
+    monkeypatch.setenv("TEST_LIMIT_CONCURRENCY", "3")
+    monkeypatch.setenv("ADMISSION_RETRY_AFTER", "7")
+    limit = create_admission_limit("TEST_LIMIT", "test", 1, 2, 100)
+    assert (limit.concurrency, limit.queue_size, limit.max_bytes, limit.retry_after) == (3, 2, 100, 7)
+
+def test_admission_middleware_too_many_requests():
+    async def run():
+        started = []
+        release = asyncio.Event()
+        app = create_app(AdmissionLimit("test_429", 1, queue_size=0, retry_after=3), started, release)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            first = asyncio.create_task(client.post("/work", content=b"data"))
+            while not started:
+                await asyncio.sleep(0.001)
+
+            rejected = await client.post("/work", content=b"data")
+            release.set()
+            return rejected, await first
+
+    rejected, first = asyncio.run(run())
+    assert rejected.status_code == 429
+    assert rejected.headers["Retry-After"] == "3"
+    assert first.json() == { "bytes": 4 }
+
+def test_admission_middleware_body_too_large():
+    async def chunks():
+        for _ in range(5):
+            yield b"x" * 10
+
+    async def run():
+        release = asyncio.Event()
+        release.set()
+        limit = AdmissionLimit("test_413", 1, max_bytes=20)
+        app = create_app(limit, [], release)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            declared = await client.post("/work", content=b"x" * 30)
+            streamed = await client.post("/work", content=chunks())
+            accepted = await client.post("/work", content=b"x" * 20)
+        return declared, streamed, accepted, limit
+
+    declared, streamed, accepted, limit = asyncio.run(run())
+    assert declared.status_code == 413
+    assert streamed.status_code == 413
+    assert accepted.json() == { "bytes": 20 }
+    assert limit.active == 0
@@ -0,0 +1,46 @@
+import hashlib
+import os
+import pytest
+from src.blobs import BlobStore, blob_type, create_blob_store
+
+def test_blob_store_put_and_find(tmp_path):
+    store = BlobStore(str(tmp_path))
+    hash = store.put(b"image", "image/jpeg")
+    assert hash == hashlib.sha256(b"image").hexdigest()
+
+    path = store.find(hash)
+    assert path == os.path.join(str(tmp_path), hash[:2], hash + ".jpg")
+    with open(path, "rb") as file:
+        assert file.read() == b"image"
+
+    assert store.url(hash) == "/image/" + hash
+
+def test_blob_store_deduplicates(tmp_path):
+    store = BlobStore(str(tmp_path))
+    assert store.put(b"image", "image/png") == store.put(b"image", "image/png")
+    assert len(os.listdir(tmp_path / store.put(b"image", "image/png")[:2])) == 1
+
+def test_blob_store_only_raster_images(tmp_path):
+    store = BlobStore(str(tmp_path))
+    for mime in ["text/html", "image/svg+xml", "application/octet-stream", "", None]:
+        with pytest.raises(ValueError):
+            store.put(b"<script>alert(1)</script>", mime)
+
+    assert blob_type(store.find(store.put(b"image", "image/webp; charset=binary"))) == "image/webp"
+    assert blob_type("image.html") == "application/octet-stream"
+
+def test_blob_store_find_unknown(tmp_path):
+    store = BlobStore(str(tmp_path))
+    assert store.find("0" * 64) is None
+    assert store.find("../secret") is None
+    assert store.find("A" * 64) is None
+
+def test_create_blob_store(tmp_path, monkeypatch):
+    monkeypatch.delenv("TEST_STORE_PATH", raising=False)
+    assert create_blob_store("TEST_STORE") is None
+
+    monkeypatch.setenv("TEST_STORE_PATH", str(tmp_path))
+    monkeypatch.setenv("TEST_STORE_URL", "https://cdn.example.com/")
+    store = create_blob_store("TEST_STORE")
+    assert store.path == str(tmp_path)
+    assert store.url("abc") == "https://cdn.example.com/abc"
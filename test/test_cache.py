@@ -0,0 +1,151 @@
+import asyncio
+import threading
+import src.cache
+from src.cache import MemoryCache, SqliteCache, TieredCache, call_cache, create_cache, normalize_url
+
+# url normalization
+def test_normalize_url_host_and_fragment():
+    result = normalize_url("HTTPS://WWW.Example.com:443/recipes/cake/#reviews")
+    assert result == "https://www.example.com/recipes/cake"
+
+def test_normalize_url_query():
+    result = normalize_url("https://example.com/cake?b=2&utm_source=news&a=1&fbclid=x")
+    assert result == "https://example.com/cake?a=1&b=2"
+
+def test_normalize_url_custom_port():
+    result = normalize_url("http://localhost:8080/cake")
+    assert result == "http://localhost:8080/cake"
+
+# memory cache
+def test_memory_cache_hit_miss():
+    cache = MemoryCache()
+    assert cache.get("a") is None
+    cache.set("a", {"title": "cake"})
+    assert cache.get("a") == {"title": "cake"}
+    assert cache.stats() == { "backend": "memory", "hits": 1, "misses": 1, "hit_ratio": 0.5, "size": 1 }
+
+def test_memory_cache_lru_eviction():
+    cache = MemoryCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+def test_memory_cache_ttl(monkeypatch):
+    now = [100]
+    monkeypatch.setattr(src.cache, "monotonic", lambda: now[0])
+    cache = MemoryCache(ttl=10)
+    cache.set("a", 1)
+    now[0] = 109
+    assert cache.get("a") == 1
+    now[0] = 110
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+
+# sqlite cache
+def test_sqlite_cache_hit_miss(tmp_path):
+    cache = SqliteCache(str(tmp_path / "cache.db"))
+    assert cache.get("a") is None
+    cache.set("a", {"title": "cake"})
+    assert cache.get("a") == {"title": "cake"}
+    assert cache.stats() == { "backend": "sqlite", "hits": 1, "misses": 1, "hit_ratio": 0.5, "size": 1 }
+
+def test_sqlite_cache_shared(tmp_path):
+    SqliteCache(str(tmp_path / "cache.db")).set("a", 1)
+    assert SqliteCache(str(tmp_path / "cache.db")).get("a") == 1
+
+def test_sqlite_cache_lru_eviction(tmp_path, monkeypatch):
+    now = [100]
+    monkeypatch.setattr(src.cache, "time", lambda: now[0])
+    cache = SqliteCache(str(tmp_path / "cache.db"), max_entries=2)
+    cache.set("a", 1)
+    now[0] += 1
+    cache.set("b", 2)
+    now[0] += 1
+    cache.get("a")
+    now[0] += 1
+    cache.set("c", 3)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+def test_sqlite_cache_ttl(tmp_path, monkeypatch):
+    now = [100]
+    monkeypatch.setattr(src.cache, "time", lambda: now[0])
+    cache = SqliteCache(str(tmp_path / "cache.db"), ttl=10)
+    cache.set("a", 1)
+    now[0] = 110
+    assert cache.get("a") is None
+
+# factory
+def test_create_cache_from_environment(tmp_path, monkeypatch):
+    monkeypatch.setenv("TEST_CACHE_BACKEND", "sqlite")
+    monkeypatch.setenv("TEST_CACHE_PATH", str(tmp_path / "cache.db"))
+    monkeypatch.setenv("TEST_CACHE_TTL", "5")
+    cache = create_cache("TEST_CACHE")
+    assert isinstance(cache, SqliteCache)
+    assert cache.ttl == 5
+
+def test_create_cache_disabled(monkeypatch):
+    monkeypatch.setenv("TEST_CACHE_BACKEND", "none")
+    assert create_cache("TEST_CACHE") is None
+
+def test_memory_cache_max_bytes():
+    cache = MemoryCache(ttl=0, max_bytes=10)
+    cache.set("a", "12345")
+    cache.set("b", "1234")
+    cache.set("c", "123")
+    assert cache.get("a") is None
+    assert cache.get("b") == "1234"
+    assert cache.stats()["bytes"] == 7
+
+    cache.set("d", "12345678901")
+    assert cache.get("d") is None
+    assert cache.stats()["bytes"] == 7
+
+# tiered cache
+def test_tiered_cache_promotes_from_disk(tmp_path):
+    cache = TieredCache(MemoryCache(max_entries=1), SqliteCache(str(tmp_path / "cache.db")))
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.memory.get("a") is None
+    assert cache.get("a") == 1
+    assert cache.memory.get("a") == 1
+    assert cache.get("c") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+def test_create_cache_tiered(tmp_path, monkeypatch):
+    monkeypatch.setenv("TEST_CACHE_BACKEND", "tiered")
+    monkeypatch.setenv("TEST_CACHE_PATH", str(tmp_path / "cache.db"))
+    monkeypatch.setenv("TEST_CACHE_MAX_BYTES", "100")
+    cache = create_cache("TEST_CACHE")
+    assert isinstance(cache, TieredCache)
+    assert cache.memory.max_bytes == 100
+
+# async calls
+def test_call_cache(tmp_path):
+    async def run(cache):
+        await call_cache(cache, "set", "a", 1)
+        return await call_cache(cache, "get", "a")
+
+    assert asyncio.run(run(MemoryCache())) == 1
+    assert asyncio.run(run(SqliteCache(str(tmp_path / "cache.db")))) == 1
+    assert asyncio.run(run(None)) is None
+
+def test_call_cache_sqlite_off_event_loop(tmp_path):
+    threads = []
+    class TrackedCache(SqliteCache):
+        def get(self, key):
+            threads.append(threading.get_ident())
+            return super().get(key)
+
+    async def run(cache):
+        await call_cache(cache, "get", "a")
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(run(TrackedCache(str(tmp_path / "cache.db"))))
+    assert threads and threads[0] != loop_thread
@@ -0,0 +1,123 @@
+import asyncio
+import gzip
+import httpx
+import pytest
+import src.fetch
+from functools import partial
+from src.cache import MemoryCache
+from src.fetch import ResponseTooLarge, fetch_html, fetch_image_content, get_timeout, parse_host_timeouts
+
+def use_transport(monkeypatch, handler):
+    monkeypatch.setattr(src.fetch, "_client", None)
+    monkeypatch.setattr(src.fetch, "fetch_cache", None)
+    monkeypatch.setattr(src.fetch.httpx, "AsyncClient", partial(httpx.AsyncClient, transport=httpx.MockTransport(handler)))
+
+def test_parse_host_timeouts():
+    result = parse_host_timeouts("www.Example.com=5, slow.com=30.5,invalid")
+    assert result == { "www.example.com": 5, "slow.com": 30.5 }
+
+def test_get_timeout(monkeypatch):
+    monkeypatch.setattr(src.fetch, "fetch_host_timeouts", { "slow.com": 30 })
+    assert get_timeout("https://slow.com/cake") == 30
+    assert get_timeout("https://fast.com/cake") == src.fetch.fetch_timeout
+
+def test_fetch_html(monkeypatch):
+    use_transport(monkeypatch, lambda request: httpx.Response(200, text="<html>" + request.url.host + "</html>"))
+    result = asyncio.run(fetch_html("https://example.com/cake"))
+    assert result == "<html>example.com</html>"
+
+def test_fetch_image_content(monkeypatch):
+    use_transport(monkeypatch, lambda request: httpx.Response(200, headers={ "Content-Type": "image/png" }, content=b"image"))
+    result = asyncio.run(fetch_image_content("https://example.com/cake.png"))
+    assert result == ("image/png", b"image")
+
+def test_fetch_error_status(monkeypatch):
+    use_transport(monkeypatch, lambda request: httpx.Response(404))
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(fetch_html("https://example.com/missing"))
+
+def test_fetch_host_concurrency(monkeypatch):
+    active = {}
+    peak = {}
+    async def handler(request):
+        host = request.url.host
+        active[host] = active.get(host, 0) + 1
+        peak[host] = max(peak.get(host, 0), active[host])
+        await asyncio.sleep(0.01)
+        active[host] -= 1
+        return httpx.Response(200, text=host)
+
+    use_transport(monkeypatch, handler)
+    monkeypatch.setattr(src.fetch, "fetch_host_concurrency", 2)
+
+    async def run():
+        urls = [f"https://{host}.com/{index}" for host in ["a", "b"] for index in range(6)]
+        return await asyncio.gather(*map(fetch_html, urls))
+
+    result = asyncio.run(run())
+    assert len(result) == 12
+    assert peak == { "a.com": 2, "b.com": 2 }
+
+def test_fetch_max_bytes(monkeypatch):
+    use_transport(monkeypatch, lambda request: httpx.Response(200, content=b"x" * 100))
+    monkeypatch.setattr(src.fetch, "fetch_max_bytes", 10)
+    with pytest.raises(ResponseTooLarge):
+        asyncio.run(fetch_html("https://example.com/big"))
+
+    result = asyncio.run(src.fetch.fetch("https://example.com/big", max_bytes=0))
+    assert result.content == b"x" * 100
+
+def test_fetch_max_bytes_streamed(monkeypatch):
+    async def chunks():
+        for _ in range(10):
+            yield b"x" * 10
+
+    use_transport(monkeypatch, lambda request: httpx.Response(200, content=chunks()))
+    monkeypatch.setattr(src.fetch, "fetch_max_bytes", 50)
+    with pytest.raises(ResponseTooLarge):
+        asyncio.run(fetch_html("https://example.com/big"))
+
+def test_fetch_image_max_bytes(monkeypatch):
+    use_transport(monkeypatch, lambda request: httpx.Response(200, headers={ "Content-Type": "image/png" },
+                                                              content=b"x" * 100))
+    monkeypatch.setattr(src.fetch, "fetch_image_max_bytes", 10)
+    with pytest.raises(ResponseTooLarge):
+        asyncio.run(fetch_image_content("https://example.com/cake.png"))
+
+    monkeypatch.setattr(src.fetch, "fetch_image_max_bytes", 100)
+    assert asyncio.run(fetch_image_content("https://example.com/cake.png")) == ("image/png", b"x" * 100)
+
+def test_fetch_gzip(monkeypatch):
+    use_transport(monkeypatch, lambda request: httpx.Response(200, headers={ "Content-Encoding": "gzip" },
+                                                              content=gzip.compress(b"<html></html>")))
+    assert asyncio.run(fetch_html("https://example.com/cake")) == "<html></html>"
+
+def test_fetch_revalidation(monkeypatch):
+    requests = []
+    def handler(request):
+        requests.append(request)
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304, headers={ "ETag": '"v1"' })
+        return httpx.Response(200, headers={ "ETag": '"v1"', "Content-Type": "image/png" }, content=b"image")
+
+    use_transport(monkeypatch, handler)
+    monkeypatch.setattr(src.fetch, "fetch_cache", MemoryCache())
+
+    assert asyncio.run(fetch_image_content("https://example.com/cake.png")) == ("image/png", b"image")
+    assert asyncio.run(fetch_image_content("https://example.com/cake.png")) == ("image/png", b"image")
+    assert "If-None-Match" not in requests[0].headers
+    assert requests[1].headers["If-None-Match"] == '"v1"'
+
+def test_fetch_revalidation_last_modified(monkeypatch):
+    last_modified = "Wed, 21 Oct 2015 07:28:00 GMT"
+    def handler(request):
+        if request.headers.get("If-Modified-Since") == last_modified:
+            return httpx.Response(304)
+        return httpx.Response(200, headers={ "Last-Modified": last_modified }, text="<html>cake</html>")
+
+    use_transport(monkeypatch, handler)
+    monkeypatch.setattr(src.fetch, "fetch_cache", MemoryCache())
+
+    assert asyncio.run(fetch_html("https://example.com/cake")) == "<html>cake</html>"
+    assert asyncio.run(fetch_html("https://example.com/cake")) == "<html>cake</html>"
+    assert src.fetch.fetch_cache.stats()["hits"] == 1
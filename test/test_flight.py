@@ -0,0 +1,65 @@
+import asyncio
+import pytest
+from src.flight import SingleFlight
+
+def test_single_flight_shares_result():
+    calls = []
+    async def call(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return { "key": key }
+
+    async def run():
+        flights = SingleFlight("test")
+        results = await asyncio.gather(*[flights.run(key, lambda key=key: call(key)) for key in ["a", "a", "a", "b"]])
+        assert flights.in_flight() == 0
+        return results
+
+    results = asyncio.run(run())
+    assert calls == ["a", "b"]
+    assert results[0] is results[1] is results[2]
+    assert results[3] == { "key": "b" }
+
+def test_single_flight_shares_error():
+    calls = []
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise ValueError("failed")
+
+    async def run():
+        flights = SingleFlight("test")
+        return await asyncio.gather(flights.run("a", call), flights.run("a", call), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(isinstance(result, ValueError) for result in results)
+
+def test_single_flight_runs_again_when_done():
+    calls = []
+    async def call():
+        calls.append(1)
+        return len(calls)
+
+    async def run():
+        flights = SingleFlight("test")
+        return [await flights.run("a", call), await flights.run("a", call)]
+
+    assert asyncio.run(run()) == [1, 2]
+
+def test_single_flight_caller_cancelled():
+    async def call():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def run():
+        flights = SingleFlight("test")
+        first = asyncio.create_task(flights.run("a", call))
+        second = asyncio.create_task(flights.run("a", call))
+        await asyncio.sleep(0.005)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == "done"
@@ -0,0 +1,125 @@
+import io
+import pytest
+import src.images
+from src.blobs import BlobStore
+from src.cache import MemoryCache
+from src.images import image_cache_key, image_cache_stats, parse_image_cached, parse_images, save_downloaded_image
+from src.util import parse_image, to_data_uri
+from PIL import Image
+
+def read_test_image() -> bytes:
+    with open("test/test_image.jpeg", "rb") as file:
+        return file.read()
+
+def count_parse_image(monkeypatch) -> list:
+    calls = []
+    def counted_parse_image(*args):
+        calls.append(args[0])
+        return parse_image(*args)
+
+    monkeypatch.setattr(src.images, "parse_image", counted_parse_image)
+    monkeypatch.setattr(src.images, "image_cache", MemoryCache(ttl=0, max_bytes=1024 * 1024))
+    monkeypatch.setattr(src.images, "_saved", { "bytes": 0 })
+    return calls
+
+def test_image_cache_key():
+    key = image_cache_key("photo.JPEG", b"image", True, "fast")
+    assert key.endswith("|.jpeg|True|fast")
+    assert key != image_cache_key("photo.jpeg", b"image", True, "balanced")
+    assert key != image_cache_key("photo.jpeg", b"other", True, "fast")
+    assert key == image_cache_key("other.jpeg", b"image", True, "fast")
+
+def test_parse_image_cached(monkeypatch):
+    calls = count_parse_image(monkeypatch)
+    image = read_test_image()
+
+    first = parse_image_cached("a.jpeg", image)
+    second = parse_image_cached("b.jpeg", image)
+    assert first == second
+    assert first.startswith("data:image/jpeg;base64,")
+    assert calls == ["a.jpeg"]
+
+    stats = image_cache_stats()
+    assert stats["hits"] == 1
+    assert stats["hit_ratio"] == 0.5
+    assert stats["bytes_saved"] == len(image)
+
+def test_parse_image_cached_parameters(monkeypatch):
+    calls = count_parse_image(monkeypatch)
+    image = read_test_image()
+
+    parse_image_cached("a.jpeg", image, True, "fast")
+    parse_image_cached("a.jpeg", image, True, "balanced")
+    assert len(calls) == 2
+
+def test_parse_images_duplicates(monkeypatch):
+    calls = count_parse_image(monkeypatch)
+    image = read_test_image()
+
+    items = [("a.jpeg", image, True, "fast"), ("b.jpeg", image, True, "fast"), ("c.jpeg", image, False, "fast")]
+    result = list(parse_images(items))
+    assert result[0] == result[1]
+    assert result[2] == parse_image("c.jpeg", image, False)
+    assert calls == ["a.jpeg", "c.jpeg"]
+
+def test_parse_image_cache_disabled(monkeypatch):
+    monkeypatch.setattr(src.images, "image_cache", None)
+    assert image_cache_stats() is None
+    assert parse_image_cached("a.jpeg", read_test_image()).startswith("data:image/jpeg;base64,")
+
+def test_parse_image_cached_store(tmp_path, monkeypatch):
+    count_parse_image(monkeypatch)
+    monkeypatch.setattr(src.images, "image_store", BlobStore(str(tmp_path)))
+    image = read_test_image()
+
+    url = parse_image_cached("a.jpeg", image)
+    assert url.startswith("/image/")
+    assert parse_image_cached("b.jpeg", image) == url
+    assert image_cache_key("a.jpeg", image, True, "balanced").endswith("|store")
+
+    path = src.images.find_image(url[len("/image/"):])
+    with open(path, "rb") as file:
+        assert to_data_uri("image/jpeg", file.read()) == parse_image("a.jpeg", image)
+
+def test_parse_images_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(src.images, "image_cache", None)
+    monkeypatch.setattr(src.images, "image_store", BlobStore(str(tmp_path)))
+    image = read_test_image()
+
+    result = list(parse_images([("a.jpeg", image, True, "fast"), ("b.jpeg", image, True, "fast")]))
+    assert result[0].startswith("/image/")
+    assert result[0] == result[1]
+    assert len(list(tmp_path.glob("*/*"))) == 1
+
+def test_image_cache_key_output(monkeypatch):
+    key = image_cache_key("photo.jpeg", b"image", True, "fast")
+    monkeypatch.setattr(src.images, "image_output_format", "webp")
+    monkeypatch.setattr(src.images, "image_output_max_bytes", 50000)
+    assert image_cache_key("photo.jpeg", b"image", True, "fast") == key + "|webp|None|50000"
+
+def test_save_downloaded_image(monkeypatch):
+    monkeypatch.setattr(src.images, "image_cache", None)
+    image = read_test_image()
+    assert save_downloaded_image("image/jpeg", image) == parse_image_cached("image.jpg", image, True, "balanced")
+    assert save_downloaded_image("image/jpeg; charset=binary", image).startswith("data:image/jpeg;base64,")
+
+    monkeypatch.setattr(src.images, "image_output_format", "webp")
+    assert save_downloaded_image("image/jpeg", image).startswith("data:image/webp;base64,")
+
+def test_save_downloaded_image_webp(monkeypatch):
+    monkeypatch.setattr(src.images, "image_cache", None)
+    monkeypatch.setattr(src.images, "image_output_format", "original")
+    output = io.BytesIO()
+    Image.open(io.BytesIO(read_test_image())).save(output, format="webp")
+    assert save_downloaded_image("image/webp", output.getvalue()).startswith("data:image/webp;base64,")
+
+def test_save_downloaded_image_not_decodable(tmp_path, monkeypatch):
+    monkeypatch.setattr(src.images, "image_cache", None)
+    monkeypatch.setattr(src.images, "image_store", None)
+    assert save_downloaded_image("image/png", b"image") == to_data_uri("image/png", b"image")
+    assert save_downloaded_image("image/svg+xml", b"<svg></svg>") == to_data_uri("image/svg+xml", b"<svg></svg>")
+
+    monkeypatch.setattr(src.images, "image_store", BlobStore(str(tmp_path)))
+    for mime in ["image/svg+xml", "text/html"]:
+        with pytest.raises(ValueError):
+            save_downloaded_image(mime, b"<svg onload=alert(1)></svg>")
@@ -0,0 +1,50 @@
+import json
+import logging
+import queue
+from uuid import uuid4
+from src.logs import DroppingQueueHandler, JsonFormatter, SamplingFilter, log_finished
+
+def create_record(level: int = logging.INFO, **extra) -> logging.LogRecord:
+    record = logging.LogRecord("test", level, __file__, 1, "Finished %s", ("request",), None)
+    record.__dict__.update(extra)
+    return record
+
+def test_json_formatter():
+    result = json.loads(JsonFormatter().format(create_record(correlation_id="abc", stages={ "scrape": 0.1 }, sample=True)))
+    assert result["level"] == "INFO"
+    assert result["message"] == "Finished request"
+    assert result["correlation_id"] == "abc"
+    assert result["stages"] == { "scrape": 0.1 }
+    assert "sample" not in result
+    assert result["time"].endswith("Z")
+
+def test_sampling_filter():
+    sampling = SamplingFilter(after=2, rate=0)
+    kept = [sampling.filter(create_record(sample=True)) for _ in range(5)]
+    assert kept == [True, True, False, False, False]
+    assert sampling.filter(create_record(logging.ERROR))
+
+def test_sampling_filter_disabled():
+    sampling = SamplingFilter(after=0, rate=1)
+    assert all(sampling.filter(create_record(sample=True)) for _ in range(5))
+
+def test_dropping_queue_handler():
+    records = queue.Queue(1)
+    handler = DroppingQueueHandler(records)
+    handler.handle(create_record())
+    handler.handle(create_record())
+    assert records.qsize() == 1
+
+def test_log_finished():
+    records = queue.Queue()
+    logger = logging.getLogger("test_log_finished")
+    logger.setLevel(logging.INFO)
+    logger.addHandler(DroppingQueueHandler(records))
+    correlation_id = uuid4()
+
+    log_finished(logger, "Finished processing parse request", correlation_id, 0.123456, url="https://example.com")
+    record = records.get_nowait()
+    assert record.correlation_id == str(correlation_id)
+    assert record.seconds == 0.1235
+    assert record.url == "https://example.com"
+    assert record.sample
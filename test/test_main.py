@@ -1,11 +1,23 @@
+import asyncio
+import io
+import json
+import pytest
 from fastapi.testclient import TestClient
+import src.images
+import src.main
 from src.main import app
+from src.blobs import BlobStore
+from src.cache import MemoryCache
+from src.recipes import RecipeStore
+from src.models import Recipe
+from test.helpers import create_backup
 from src.util import parse_recipe_ingredient, parse_recipe_instruction
 from pint import UnitRegistry
 
 client = TestClient(app)
 
 parse_test_url = "/recipe/parse"
+batch_test_url = "/recipe/parse/batch"
 backup_test_url = "/recipe/backup/parse"
 image_test_url = "/image/process"
 
@@ -100,4 +112,336 @@ def test_process_image_bad_mime():
     assert response.status_code == 400
     parsed_response = response.json()
     
-    assert parsed_response["detail"] == "The image file is invalid"
\ No newline at end of file
+    assert parsed_response["detail"] == "The image file is invalid"
+
+def test_process_image_too_large(monkeypatch):
+    monkeypatch.setattr(src.main.admission_limits[image_test_url], "max_bytes", 100)
+    response = client.post(image_test_url, files={"file": ("test_image.jpeg", open("test/test_image.jpeg", "rb"), "image/jpeg")})
+    assert response.status_code == 413
+    assert response.json()["detail"] == "The uploaded file is too large"
+
+def test_recipe_cache_measures_json_bytes():
+    assert src.main.recipe_cache.sizeof({ "title": "cake", "image": "data:image/jpeg;base64,AAAA" }) == 54
+
+def test_parse_backup_no_size_limit_by_default():
+    assert src.main.admission_limits[backup_test_url].max_bytes == 0
+
+class FakeScraper:
+    def language(self):
+        return "en"
+
+    def title(self):
+        return "Carrot cake"
+
+    def total_time(self):
+        return 60
+
+    def yields(self):
+        return "8 servings"
+
+    def ingredients(self):
+        return ["3 eggs", "1 cup sugar"]
+
+    def instructions_list(self):
+        return ["Bake for 40 minutes"]
+
+    def image(self):
+        return "https://example.com/cake.jpeg"
+
+    def host(self):
+        return "example.com"
+
+@pytest.fixture
+def fake_site(monkeypatch):
+    """Serves every recipe URL as a page parsed by FakeScraper, URLs containing missing fail, without recipe cache
+
+    Returns:
+        list: URLs fetched
+    """
+    fetched = []
+    async def fake_fetch_html(url):
+        fetched.append(url)
+        await asyncio.sleep(0.01)
+        if "missing" in url:
+            raise Exception("Not found")
+        return "<html></html>"
+
+    monkeypatch.setattr(src.main, "fetch_html", fake_fetch_html)
+    monkeypatch.setattr(src.main, "scrape_html", lambda html, **options: FakeScraper())
+    monkeypatch.setattr(src.main, "recipe_cache", None)
+    return fetched
+
+def test_recipe_parse_cache_hit(fake_site, monkeypatch):
+    monkeypatch.setattr(src.main, "recipe_cache", MemoryCache())
+
+    first = client.post(parse_test_url, json={ "url": "https://example.com/cake#top" })
+    second = client.post(parse_test_url, json={ "url": "https://EXAMPLE.com/cake" })
+    assert first.status_code == 200
+    assert second.json() == first.json()
+    assert second.json()["title"] == "Carrot cake"
+    assert len(fake_site) == 1
+
+    stats = client.get("/cache/stats").json()
+    assert stats["recipe"]["hits"] == 1
+    assert stats["recipe"]["misses"] == 1
+
+def test_recipe_parse_fetch_image(fake_site, monkeypatch):
+    async def fake_fetch_image_content(url):
+        with open("test/test_image.jpeg", "rb") as file:
+            return "image/jpeg", file.read()
+
+    monkeypatch.setattr(src.main, "fetch_image_content", fake_fetch_image_content)
+
+    response = client.post(parse_test_url, json={ "url": "https://example.com/cake", "downloadImage": True })
+    assert response.status_code == 200
+    parsed_response = response.json()
+    assert parsed_response["image"].startswith("data:image/jpeg;base64,")
+    assert parsed_response["ingredients"][1]["unit"] == "cup"
+    assert parsed_response["steps"][0]["minutes"] == 40
+
+def test_recipe_parse_batch(fake_site):
+    response = client.post(batch_test_url, json=[
+        { "url": "https://example.com/cake" },
+        { "url": "https://example.com/missing" },
+        { "url": "https://example.org/cake" }
+    ])
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+
+    results = sorted(map(json.loads, response.text.splitlines()), key=lambda x: x["index"])
+    assert len(results) == 3
+    assert results[0]["recipe"]["title"] == "Carrot cake"
+    assert results[1]["url"] == "https://example.com/missing"
+    assert results[1]["error"] == "Could not find a recipe in the web page"
+    assert "recipe" not in results[1]
+    assert results[2]["recipe"]["host"] == "example.com"
+
+def test_recipe_parse_batch_too_large(monkeypatch):
+    monkeypatch.setattr(src.main, "batch_max_items", 1)
+    response = client.post(batch_test_url, json=[{ "url": "https://example.com/a" }, { "url": "https://example.com/b" }])
+    assert response.status_code == 400
+
+def test_parse_backup_stream():
+    response = client.post(backup_test_url, params={ "stream": True }, files={"file": ("test_backup.zip", open("test/test_backup.zip", "rb"), "application/x-zip-compressed")})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+
+    lines = response.text.splitlines()
+    assert len(lines) == 1
+    recipe = json.loads(lines[0])
+    assert recipe["title"] == "Carrot cake"
+    assert recipe["image"].startswith("data:image/jpeg;base64,/9j/4AAQSkZJRgABAQAAAQABAAD")
+    assert len(recipe["ingredients"]) == 6
+    assert len(recipe["steps"]) == 6
+
+def test_parse_backup_stream_bad_zip():
+    response = client.post(backup_test_url, params={ "stream": True }, files={"file": ("test_backup.zip", open("test/test_image.jpeg", "rb"), "application/zip")})
+    assert response.status_code == 400
+
+def test_seekable_upload():
+    class SpooledFile:
+        def __init__(self, file):
+            self._file = file
+
+    file = io.BytesIO(b"backup")
+    assert src.main.seekable_upload(file) is file
+    assert src.main.seekable_upload(SpooledFile(file)) is file
+
+def test_process_image_resize_mode():
+    response = client.post(image_test_url, params={ "resizeMode": "fast" }, files={"file": ("test_image.jpeg", open("test/test_image.jpeg", "rb"), "image/jpeg")})
+    assert response.status_code == 200
+    assert response.json()["image"].startswith("data:image/jpeg;base64,/9j/4AAQSkZJRgABAQAAAQABAAD")
+
+def test_process_image_bad_resize_mode():
+    response = client.post(image_test_url, params={ "resizeMode": "slow" }, files={"file": ("test_image.jpeg", open("test/test_image.jpeg", "rb"), "image/jpeg")})
+    assert response.status_code == 422
+
+def test_parse_backup_image_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(src.images, "image_cache", None)
+    monkeypatch.setattr(src.images, "image_store", BlobStore(str(tmp_path)))
+
+    response = client.post(backup_test_url, files={"file": ("test_backup.zip", open("test/test_backup.zip", "rb"), "application/x-zip-compressed")})
+    assert response.status_code == 200
+    url = response.json()[0]["image"]
+    assert url.startswith("/image/")
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/jpeg"
+    assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert response.headers["x-content-type-options"] == "nosniff"
+    assert response.headers["content-security-policy"] == "sandbox"
+    assert response.content.startswith(b"\xff\xd8")
+
+    response = client.get(url, headers={ "If-None-Match": response.headers["etag"] })
+    assert response.status_code == 304
+
+def test_recipe_parse_download_image_store(fake_site, tmp_path, monkeypatch):
+    async def fake_fetch_image_content(url):
+        return "image/jpeg", b"image"
+
+    monkeypatch.setattr(src.images, "image_store", BlobStore(str(tmp_path)))
+    monkeypatch.setattr(src.main, "fetch_image_content", fake_fetch_image_content)
+
+    response = client.post(parse_test_url, json={ "url": "https://example.com/cake", "downloadImage": True })
+    assert response.status_code == 200
+    assert client.get(response.json()["image"]).content == b"image"
+
+def test_recipe_parse_download_html_not_stored(fake_site, tmp_path, monkeypatch):
+    async def fake_fetch_image_content(url):
+        return "text/html", b"<script>alert(1)</script>"
+
+    monkeypatch.setattr(src.images, "image_store", BlobStore(str(tmp_path)))
+    monkeypatch.setattr(src.main, "fetch_image_content", fake_fetch_image_content)
+
+    response = client.post(parse_test_url, json={ "url": "https://example.com/cake", "downloadImage": True })
+    assert response.status_code == 200
+    assert response.json()["image"] == "https://example.com/cake.jpeg"
+    assert list(tmp_path.iterdir()) == []
+
+def test_recipe_parse_download_svg_no_store(fake_site, monkeypatch):
+    async def fake_fetch_image_content(url):
+        return "image/svg+xml", b"<svg></svg>"
+
+    monkeypatch.setattr(src.images, "image_store", None)
+    monkeypatch.setattr(src.images, "image_cache", None)
+    monkeypatch.setattr(src.main, "fetch_image_content", fake_fetch_image_content)
+
+    response = client.post(parse_test_url, json={ "url": "https://example.com/cake", "downloadImage": True })
+    assert response.status_code == 200
+    assert response.json()["image"] == "data:image/svg+xml;base64,PHN2Zz48L3N2Zz4="
+
+def test_get_image_not_found(tmp_path, monkeypatch):
+    assert client.get("/image/" + "0" * 64).status_code == 404
+    monkeypatch.setattr(src.images, "image_store", BlobStore(str(tmp_path)))
+    assert client.get("/image/" + "0" * 64).status_code == 404
+
+def test_metrics(fake_site):
+    assert client.post(parse_test_url, json={ "url": "https://example.com/cake" }).status_code == 200
+    assert client.get("/image/missing").status_code == 404
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    for stage in ["html_fetch", "scrape", "ingredient_parse", "instruction_parse", "serialize"]:
+        assert f'recipe_stage_seconds_count{{stage="{stage}"}}' in response.text
+
+    assert 'http_request_duration_seconds_count{endpoint="/recipe/parse"}' in response.text
+    assert 'http_request_errors_total{endpoint="/image/{hash}",status="404"}' in response.text
+    assert 'http_requests_in_flight{endpoint="/metrics"} 1' in response.text
+
+def test_recipe_parse_batch_coalesced(fake_site):
+    urls = ["https://example.com/cake", "https://EXAMPLE.com/cake/?utm_source=news", "https://example.com/pie"]
+    response = client.post(batch_test_url, json=[{ "url": url } for url in urls])
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 3
+    assert all("recipe" in line for line in lines)
+    assert len(fake_site) == 2
+
+def test_parse_backup_manifest():
+    backup = open("test/test_backup.zip", "rb").read()
+    response = client.post(backup_test_url, files={"file": ("test_backup.zip", backup, "application/zip")})
+    fingerprint = response.json()[0]["fingerprint"]
+    assert len(fingerprint) == 64
+
+    response = client.post(backup_test_url, data={ "manifest": json.dumps([fingerprint]) },
+                           files={"file": ("test_backup.zip", backup, "application/zip")})
+    assert response.status_code == 200
+    assert response.json() == []
+
+    response = client.post(backup_test_url, params={ "stream": True }, data={ "manifest": json.dumps(["other"]) },
+                           files={"file": ("test_backup.zip", backup, "application/zip")})
+    assert json.loads(response.text.splitlines()[0])["fingerprint"] == fingerprint
+
+def test_parse_backup_manifest_changed_recipe():
+    backup = create_backup([(10, 10), (10, 10)])
+    fingerprints = [recipe["fingerprint"] for recipe in client.post(backup_test_url, files={"file": ("backup.zip", backup, "application/zip")}).json()]
+
+    changed = create_backup([(10, 10), (20, 20)])
+    response = client.post(backup_test_url, data={ "manifest": json.dumps(fingerprints) },
+                           files={"file": ("backup.zip", changed, "application/zip")})
+    recipes = response.json()
+    assert len(recipes) == 1
+    assert recipes[0]["title"] == "Recipe 1"
+    assert recipes[0]["fingerprint"] not in fingerprints
+
+def test_parse_backup_bad_manifest():
+    response = client.post(backup_test_url, data={ "manifest": "{}" },
+                           files={"file": ("test_backup.zip", open("test/test_backup.zip", "rb"), "application/zip")})
+    assert response.status_code == 400
+
+def test_recipe_search(fake_site, tmp_path, monkeypatch):
+    monkeypatch.setattr(src.main, "recipe_store", RecipeStore(str(tmp_path / "recipes.db")))
+
+    assert client.post(parse_test_url, json={ "url": "https://example.com/cake" }).status_code == 200
+    response = client.post(backup_test_url, files={"file": ("test_backup.zip", open("test/test_backup.zip", "rb"), "application/zip")})
+    assert response.status_code == 200
+
+    response = client.get("/recipe/search", params={ "q": "carrot", "ingredient": "sugar", "maxTime": 60 })
+    assert response.status_code == 200
+    assert [recipe["host"] for recipe in response.json()] == ["example.com", ""]
+    assert response.json()[0]["ingredients"][1]["unit"] == "cup"
+
+    response = client.get("/recipe/search", params={ "ingredient": "vegetable oil" })
+    assert [recipe["host"] for recipe in response.json()] == [""]
+    assert len(response.json()[0]["fingerprint"]) == 64
+
+    assert client.get("/recipe/search", params={ "q": "carrot", "maxTime": 30 }).json() == []
+    assert client.get("/recipe/search", params={ "limit": 1000 }).status_code == 422
+
+def test_recipe_store_failure(fake_site, tmp_path, monkeypatch):
+    class FailingStore(RecipeStore):
+        def save(self, key: str, recipe: dict):
+            raise OSError("disk full")
+
+    monkeypatch.setattr(src.main, "recipe_store", FailingStore(str(tmp_path / "recipes.db")))
+
+    response = client.post(parse_test_url, json={ "url": "https://example.com/cake" })
+    assert response.status_code == 200
+    assert response.json()["title"] == "Carrot cake"
+
+    response = client.post(backup_test_url, files={"file": ("test_backup.zip", open("test/test_backup.zip", "rb"), "application/zip")})
+    assert response.status_code == 200
+    assert len(response.json()) > 0
+
+def test_recipe_search_without_inline_images(tmp_path, monkeypatch):
+    store = RecipeStore(str(tmp_path / "recipes.db"))
+    monkeypatch.setattr(src.main, "recipe_store", store)
+    monkeypatch.setattr(src.images, "image_store", None)
+
+    response = client.post(backup_test_url, files={"file": ("test_backup.zip", open("test/test_backup.zip", "rb"), "application/zip")})
+    assert response.json()[0]["image"].startswith("data:")
+    assert [recipe["image"] for recipe in store.search()] == [None]
+
+    monkeypatch.setattr(src.images, "image_store", BlobStore(str(tmp_path / "images")))
+    monkeypatch.setattr(src.images, "image_cache", None)
+    response = client.post(backup_test_url, files={"file": ("test_backup.zip", open("test/test_backup.zip", "rb"), "application/zip")})
+    assert store.search()[0]["image"] == response.json()[0]["image"]
+    assert store.search()[0]["image"].startswith("/image/")
+
+def test_recipe_search_disabled(monkeypatch):
+    monkeypatch.setattr(src.main, "recipe_store", None)
+    response = client.get("/recipe/search", params={ "q": "cake" })
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Recipe search is not enabled"
+
+def test_recipe_convert():
+    recipe = { "title": "Carrot cake", "ingredients": [{ "raw": "2 cups flour", "quantity": 2, "unit": "cup" },
+                                                      { "raw": "3 eggs", "quantity": 3, "unit": "" }] }
+    response = client.post("/recipe/convert", json={ "recipe": recipe, "system": "metric", "scale": 2 })
+    assert response.status_code == 200
+    parsed_response = response.json()
+    assert parsed_response["title"] == "Carrot cake"
+    assert parsed_response["ingredients"][0] == { "raw": "2 cups flour", "quantity": 946.35, "unit": "milliliter" }
+    assert parsed_response["ingredients"][1]["quantity"] == 6
+
+def test_recipe_convert_bad_scale():
+    response = client.post("/recipe/convert", json={ "recipe": { "title": "Cake" }, "scale": 0 })
+    assert response.status_code == 400
+    assert response.json()["detail"] == "The scale must be greater than zero"
+
+def test_parse_backup_matches_response_model():
+    response = client.post(backup_test_url, files={"file": ("test_backup.zip", open("test/test_backup.zip", "rb"), "application/zip")})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == [Recipe(**recipe).model_dump() for recipe in response.json()]
@@ -0,0 +1,41 @@
+import pytest
+from src.metrics import Counter, Gauge, Histogram, format_labels, timed, stage_seconds
+
+def test_counter_samples():
+    counter = Counter("errors_total", "Errors", ["endpoint", "status"])
+    counter.inc("/a", "400")
+    counter.inc("/a", "400", amount=2)
+    assert counter.value("/a", "400") == 3
+    assert list(counter.samples()) == ['errors_total{endpoint="/a",status="400"} 3']
+
+def test_gauge_inc_dec():
+    gauge = Gauge("in_flight", "In flight")
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+    assert list(gauge.samples()) == ["in_flight 1"]
+
+def test_histogram_samples():
+    histogram = Histogram("stage_seconds", "Stages", ["stage"], buckets=(0.1, 1))
+    histogram.observe("scrape", value=0.05)
+    histogram.observe("scrape", value=0.1)
+    histogram.observe("scrape", value=5)
+    assert list(histogram.samples()) == [
+        'stage_seconds_bucket{stage="scrape",le="0.1"} 2',
+        'stage_seconds_bucket{stage="scrape",le="1"} 2',
+        'stage_seconds_bucket{stage="scrape",le="+Inf"} 3',
+        'stage_seconds_sum{stage="scrape"} 5.15',
+        'stage_seconds_count{stage="scrape"} 3',
+    ]
+
+def test_format_labels_escaping():
+    assert format_labels(["url"], ['a"b\\c']) == '{url="a\\"b\\\\c"}'
+    assert format_labels([], []) == ""
+
+def test_timed_records_failures():
+    count = stage_seconds.count("test_stage")
+    with pytest.raises(ValueError):
+        with timed("test_stage"):
+            raise ValueError()
+
+    assert stage_seconds.count("test_stage") == count + 1
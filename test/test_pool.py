@@ -0,0 +1,50 @@
+import base64
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from fastapi.testclient import TestClient
+from PIL import Image
+import src.pool
+from src.main import app
+from src.pool import ordered_map, shutdown_image_pool
+from test.helpers import create_backup
+
+client = TestClient(app)
+
+def slow_double(value: int, delay: float) -> int:
+    time.sleep(delay)
+    return value * 2
+
+def test_ordered_map_keeps_order():
+    with ThreadPoolExecutor(4) as executor:
+        items = [(value, 0.05 - value * 0.01) for value in range(5)]
+        result = list(ordered_map(partial(executor.submit, slow_double), items, 3))
+        assert result == [0, 2, 4, 6, 8]
+
+def test_ordered_map_window():
+    consumed = []
+    def items():
+        for value in range(10):
+            consumed.append(value)
+            yield (value, 0)
+
+    with ThreadPoolExecutor(2) as executor:
+        result = ordered_map(partial(executor.submit, slow_double), items(), 2)
+        assert next(result) == 0
+        assert len(consumed) == 2
+        result.close()
+
+def test_parse_backup_process_pool(monkeypatch):
+    monkeypatch.setattr(src.pool, "image_pool_workers", 2)
+    try:
+        backup = create_backup([(1600, 1200), (200, 100), (800, 2000), (50, 50)])
+        response = client.post("/recipe/backup/parse", files={"file": ("backup.zip", backup, "application/zip")})
+        assert response.status_code == 200
+        parsed_response = response.json()
+        assert [recipe["title"] for recipe in parsed_response] == ["Recipe 0", "Recipe 1", "Recipe 2", "Recipe 3"]
+
+        sizes = [Image.open(io.BytesIO(base64.b64decode(recipe["image"].split(",")[1]))).size for recipe in parsed_response]
+        assert sizes == [(1024, 768), (200, 100), (410, 1024), (50, 50)]
+    finally:
+        shutdown_image_pool()
@@ -0,0 +1,56 @@
+from src.recipes import RecipeStore, create_recipe_store, fts_query
+
+def create_recipe(title: str, ingredients: list, total_time: int = 0, minutes: float = 10) -> dict:
+    return {
+        "title": title,
+        "totalTime": total_time,
+        "yields": "",
+        "ingredients": [{ "raw": raw, "quantity": 1, "unit": "cup" } for raw in ingredients],
+        "steps": [{ "raw": "Bake", "minutes": minutes }],
+        "image": None,
+        "host": "example.com"
+    }
+
+def test_fts_query():
+    assert fts_query('choc "chip" OR') == '"choc"* "chip"* "OR"*'
+    assert fts_query("flour", "ingredients") == 'ingredients : "flour"*'
+    assert fts_query(" ( ") == ""
+
+def test_recipe_store_save_and_get(tmp_path):
+    store = RecipeStore(str(tmp_path / "recipes.db"))
+    recipe = create_recipe("Cake", ["1 cup sugar"])
+    store.save("https://example.com/cake", recipe)
+    assert store.get("https://example.com/cake") == recipe
+    assert store.get("https://example.com/pie") is None
+
+def test_recipe_store_replaces_recipe(tmp_path):
+    store = RecipeStore(str(tmp_path / "recipes.db"))
+    store.save("cake", create_recipe("Cake", ["1 cup sugar"]))
+    store.save("cake", create_recipe("Carrot Cake", ["2 carrots"]))
+    assert len(store.search()) == 1
+    assert store.search(ingredient="sugar") == []
+    assert [recipe["title"] for recipe in store.search("carrot")] == ["Carrot Cake"]
+
+def test_recipe_store_search(tmp_path):
+    store = RecipeStore(str(tmp_path / "recipes.db"))
+    for key, recipe in [
+        ("cookies", create_recipe("Chocolate Chip Cookies", ["2 cups flour", "1 cup chocolate chips"], minutes=12)),
+        ("brulee", create_recipe("Crème brûlée", ["2 cups cream", "4 egg yolks"], total_time=60)),
+        ("bread", create_recipe("Banana Bread", ["3 bananas", "2 cups flour"], minutes=60)),
+    ]:
+        store.save(key, recipe)
+    assert [recipe["title"] for recipe in store.search("choc")] == ["Chocolate Chip Cookies"]
+    assert [recipe["title"] for recipe in store.search("creme")] == ["Crème brûlée"]
+    assert [recipe["title"] for recipe in store.search(ingredient="flour", max_minutes=30)] == ["Chocolate Chip Cookies"]
+    assert store.search(ingredient="bread") == []
+    assert [recipe["title"] for recipe in store.search(limit=2)] == ["Banana Bread", "Crème brûlée"]
+    assert [recipe["title"] for recipe in store.search(limit=2, offset=2)] == ["Chocolate Chip Cookies"]
+
+def test_recipe_store_shared(tmp_path):
+    RecipeStore(str(tmp_path / "recipes.db")).save("cake", create_recipe("Cake", []))
+    assert RecipeStore(str(tmp_path / "recipes.db")).get("cake")["title"] == "Cake"
+
+def test_create_recipe_store(tmp_path, monkeypatch):
+    assert create_recipe_store("TEST_STORE") is None
+    monkeypatch.setenv("TEST_STORE_PATH", str(tmp_path / "recipes.db"))
+    assert isinstance(create_recipe_store("TEST_STORE"), RecipeStore)
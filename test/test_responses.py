@@ -0,0 +1,22 @@
+import json
+import src.responses
+from src.responses import FastJSONResponse, dumps, dumps_line
+
+CONTENT = [{ "title": "Crème brûlée", "totalTime": 0, "ingredients": [{ "raw": "½ cup", "quantity": 0.5, "unit": "cup" }],
+             "image": None }]
+
+def test_dumps():
+    assert json.loads(dumps(CONTENT)) == CONTENT
+    assert "Crème".encode() in dumps(CONTENT)
+    assert dumps_line(CONTENT) == dumps(CONTENT) + b"\n"
+
+def test_dumps_without_orjson(monkeypatch):
+    expected = dumps(CONTENT)
+    monkeypatch.setattr(src.responses, "orjson", None)
+    assert dumps(CONTENT) == expected
+    assert dumps_line(CONTENT) == expected + b"\n"
+
+def test_fast_json_response():
+    response = FastJSONResponse(CONTENT)
+    assert response.media_type == "application/json"
+    assert json.loads(response.body) == CONTENT
@@ -0,0 +1,81 @@
+import os
+import src.units
+from src.units import convert_ingredients, convert_recipes, create_unit_registry, get_unit_conversions, get_unit_registry
+from src.util import parse_recipe_ingredients_batch
+
+INGREDIENTS = ["2 cups flour", "1 tsp salt", "3 tablespoons oil", "250 g butter", "1.5 kg beef", "100 ml milk",
+               "2 l water", "8 oz cheese", "1 lb pasta", "1 pint cream", "1 quart stock", "1 gallon water",
+               "2 fluid_ounce gin", "3 large eggs", "2 cloves garlic", "1 inch ginger", "5 min"]
+
+def test_get_unit_registry_is_lazy_and_shared(monkeypatch):
+    monkeypatch.setattr(src.units, "_ureg", None)
+    created = []
+    def counted_create(*args):
+        created.append(args)
+        return create_unit_registry(*args)
+
+    monkeypatch.setattr(src.units, "create_unit_registry", counted_create)
+    assert len(created) == 0
+    assert get_unit_registry() is get_unit_registry()
+    assert len(created) == 1
+
+def test_cooking_units_match_full_registry():
+    full = parse_recipe_ingredients_batch(INGREDIENTS, "en", create_unit_registry("full"))
+    cooking = parse_recipe_ingredients_batch(INGREDIENTS, "en", create_unit_registry("cooking"))
+    assert cooking == full
+
+def test_unit_registry_cache_folder(tmp_path):
+    ureg = create_unit_registry("cooking", str(tmp_path))
+    assert ureg.get_name("tsp") == "teaspoon"
+    assert len(os.listdir(tmp_path)) > 0
+    assert create_unit_registry("cooking", str(tmp_path)).get_name("tsp") == "teaspoon"
+
+def test_convert_ingredients_metric():
+    ureg = create_unit_registry("cooking")
+    ingredients = parse_recipe_ingredients_batch(["2 cups flour", "1 tsp salt", "8 oz cheese", "3 large eggs",
+                                                  "350 degF oven"], "en", ureg)
+    result = convert_ingredients(ingredients, ureg, "metric", 2)
+    assert [(item["quantity"], item["unit"]) for item in result] == [(946.35, "milliliter"), (9.86, "milliliter"),
+                                                                    (453.59, "gram"), (6, ""), (350, "degree_Fahrenheit")]
+    assert result[0]["raw"] == "2 cups flour"
+
+def test_convert_ingredients_us():
+    ureg = create_unit_registry("cooking")
+    ingredients = parse_recipe_ingredients_batch(["250 g butter", "1 kg beef", "100 ml milk", "10 ml oil", "2 ml salt"],
+                                                 "en", ureg)
+    result = convert_ingredients(ingredients, ureg, "us")
+    assert [(item["quantity"], item["unit"]) for item in result] == [(8.82, "ounce"), (2.2, "pound"), (0.42, "cup"),
+                                                                    (2.03, "teaspoon"), (0.41, "teaspoon")]
+
+def test_convert_ingredients_larger_unit():
+    ureg = create_unit_registry("cooking")
+    ingredients = parse_recipe_ingredients_batch(["48 tsp sugar", "600 ml milk"], "en", ureg)
+    assert [(item["quantity"], item["unit"]) for item in convert_ingredients(ingredients, ureg, "us")][0] == (1, "cup")
+    assert convert_ingredients(ingredients, ureg, "metric", 2)[1]["unit"] == "liter"
+
+def test_convert_ingredients_scale_only():
+    ureg = create_unit_registry("cooking")
+    ingredients = parse_recipe_ingredients_batch(["2 cups flour", "3 eggs"], "en", ureg)
+    assert convert_ingredients(ingredients, ureg, None, 0.5) == [{ "raw": "2 cups flour", "quantity": 1, "unit": "cup" },
+                                                                 { "raw": "3 eggs", "quantity": 1.5, "unit": "" }]
+
+def test_convert_ingredients_keeps_tiny_units():
+    ureg = create_unit_registry("full")
+    ingredients = parse_recipe_ingredients_batch(["1 pinch salt", "1 inch ginger"], "en", ureg)
+    for system in ["metric", "us"]:
+        result = convert_ingredients(ingredients, ureg, system)
+        assert [(item["quantity"], item["unit"]) for item in result] == [(1, ingredients[0]["unit"]), (1, "inch")]
+
+def test_convert_recipes_batch():
+    ureg = create_unit_registry("cooking")
+    recipes = [{ "title": title, "ingredients": parse_recipe_ingredients_batch(lines, "en", ureg) }
+               for title, lines in [("a", ["1 cup milk"]), ("b", []), ("c", ["1 lb flour", "2 eggs"])]]
+    result = convert_recipes(recipes, ureg, "metric")
+    assert [recipe["title"] for recipe in result] == ["a", "b", "c"]
+    assert [[item["unit"] for item in recipe["ingredients"]] for recipe in result] == [["milliliter"], [], ["gram", ""]]
+    assert recipes[0]["ingredients"][0]["unit"] == "cup"
+
+def test_get_unit_conversions_shared():
+    ureg = create_unit_registry("cooking")
+    assert get_unit_conversions(ureg, "us") is get_unit_conversions(ureg, "us")
+    assert get_unit_conversions(ureg, "us") is not get_unit_conversions(ureg, "metric")
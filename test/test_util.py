@@ -1,11 +1,14 @@
 import base64
 import io
+import pytest
 from zipfile import ZipFile
 from fastapi.testclient import TestClient
 from src.main import app
 from src.util import parse_recipe_ingredient, parse_recipe_ingredients, parse_recipe_instruction
-from src.util import parse_recipe_instructions, replace_unicode_fractions, parse_image
+from src.util import parse_recipe_instructions, parse_recipe_instructions_batch, replace_unicode_fractions, parse_image, iter_json_array
+from src.util import parse_recipe_ingredients_batch, get_unit_aliases, resolve_unit, process_image
 from pint import UnitRegistry
+from PIL import Image
 
 client = TestClient(app)
 
@@ -107,6 +110,38 @@ def test_instructions_parse():
     assert parsed[1]["raw"] == "And something else and wait 1 hour"
     assert parsed[1]["minutes"] == 60
 
+def test_instruction_parse_seconds():
+    parsed = parse_recipe_instruction("Blend for 30 seconds then rest 90 secs", "en")
+    assert parsed["minutes"] == 2
+
+def test_instruction_parse_range():
+    assert parse_recipe_instruction("Bake for 10-15 minutes", "en")["minutes"] == 15
+    assert parse_recipe_instruction("Let rise 1 to 2 hours", "en")["minutes"] == 120
+    assert parse_recipe_instruction("Bake for 1-1/2 hours", "en")["minutes"] == 90
+    assert parse_recipe_instruction("Rest 1/2-1 hours", "en")["minutes"] == 60
+    assert parse_recipe_instruction("Bake 20-15 minutes", "en")["minutes"] == 20
+
+def test_instruction_parse_fraction():
+    assert parse_recipe_instruction("Simmer 1½ hours", "en")["minutes"] == 90
+    assert parse_recipe_instruction("Simmer 2 1/2 hours", "en")["minutes"] == 150
+    parsed = parse_recipe_instruction("Simmer 1½ hours", "en")
+    assert parsed["raw"] == "Simmer 1½ hours"
+
+def test_instruction_parse_abbreviations():
+    parsed = parse_recipe_instruction("Roast 2 hrs, then 20 mins at 350", "en")
+    assert parsed["minutes"] == 140
+
+def test_instruction_parse_language():
+    parsed = parse_recipe_instructions_batch(["Asse por 40 minutos", "Deixe descansar 1 a 2 horas"], "pt-BR")
+    assert parsed[0]["minutes"] == 40
+    assert parsed[1]["minutes"] == 120
+    parsed = parse_recipe_instruction("1,5 Stunden ruhen lassen", "de")
+    assert parsed["minutes"] == 90
+
+def test_instruction_parse_unknown_language():
+    parsed = parse_recipe_instruction("Wait 15 minutes", "xx")
+    assert parsed["minutes"] == 15
+
 # unicode fraction remover
 def test_replace_unicode_fractions_no_unicode():
     result = replace_unicode_fractions("1/2 cups of water")
@@ -131,4 +166,115 @@ def test_parse_image_no_resize():
     with ZipFile("test/test_backup.zip", 'r') as zip:
         image = zip.read("e99653943ef24ce18ae140c83d42349f.jpeg")
         result = parse_image("e99653943ef24ce18ae140c83d42349f.jpeg", image, False)
-        assert result.startswith("data:image/jpeg;base64,/9j/4AAQSkZJRgABAQAAAQABAAD")
\ No newline at end of file
+        assert result.startswith("data:image/jpeg;base64,/9j/4AAQSkZJRgABAQAAAQABAAD")
+# incremental json array
+def test_iter_json_array():
+    stream = io.StringIO(' [ {"title": "cake", "tags": [1, 2]}, 123, "a,]" , {"notes": "}"} ] ')
+    result = list(iter_json_array(stream, chunk_size=3))
+    assert result == [{"title": "cake", "tags": [1, 2]}, 123, "a,]", {"notes": "}"}]
+
+def test_iter_json_array_empty():
+    assert list(iter_json_array(io.StringIO("[]"))) == []
+
+def test_iter_json_array_not_array():
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO('{"title": "cake"}')))
+
+def test_iter_json_array_unterminated():
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO('[{"title": "cake"}'), chunk_size=4))
+
+def test_iter_json_array_malformed():
+    for text in ["[1 2]", "[,1]", "[1,,2]", "[1,]", "[1] 2", "[1]]", "[] []"]:
+        with pytest.raises(ValueError):
+            list(iter_json_array(io.StringIO(text), chunk_size=2))
+
+    assert list(iter_json_array(io.StringIO(" [1 , 2] \n"), chunk_size=2)) == [1, 2]
+
+def test_parse_image_resize_modes():
+    image = io.BytesIO()
+    Image.new("RGB", (3000, 2000), (200, 120, 40)).save(image, format="jpeg")
+    for mode in ["fast", "balanced", "quality"]:
+        result = parse_image("photo.jpeg", image.getvalue(), True, mode)
+        assert result.startswith("data:image/jpeg;base64,")
+        resized = Image.open(io.BytesIO(base64.b64decode(result.split(",")[1])))
+        assert resized.size == (1024, 683)
+
+def test_ingredient_parse_unicode_mixed_fraction():
+    parsed = parse_recipe_ingredient("1½ cups flour", "en", UnitRegistry())
+    assert parsed["raw"] == "1 1/2 cups flour"
+    assert parsed["quantity"] == 1.5
+    assert parsed["unit"] == "cup"
+
+def test_ingredient_parse_unit_symbol():
+    parsed = parse_recipe_ingredient("2 tsp salt", "en", UnitRegistry())
+    assert parsed["quantity"] == 2
+    assert parsed["unit"] == "teaspoon"
+
+def test_ingredients_parse_batch():
+    parsed = parse_recipe_ingredients_batch(["⅛ tsp salt", "2 ⅝ oz butter", "3 large eggs", "250 ml milk"], "en", UnitRegistry())
+    assert [(x["quantity"], x["unit"]) for x in parsed] == [(0.12, "teaspoon"), (2.62, "ounce"), (3, ""), (250, "milliliter")]
+
+def test_unit_aliases_match_registry():
+    ureg = UnitRegistry()
+    aliases = get_unit_aliases(ureg)
+    assert aliases is get_unit_aliases(ureg)
+    for unit in ["g", "gram", "tsp", "cup", "oz", "lb", "l", "liter", "ml"]:
+        assert resolve_unit(unit, aliases, ureg) == ureg.get_name(unit)
+
+def test_resolve_unit_remembers_words():
+    ureg = UnitRegistry()
+    aliases = get_unit_aliases(ureg)
+    assert resolve_unit("teaspoons", aliases, ureg) == "teaspoon"
+    assert aliases["teaspoons"] == "teaspoon"
+    assert resolve_unit("large", aliases, ureg) == ""
+    assert aliases["large"] == ""
+
+def test_replace_unicode_fractions_all():
+    result = replace_unicode_fractions("⅛ ⅜ ⅝ ⅞ ⅕ ⅙ ⅐ ⅑ ⅒ 1⁄3")
+    assert result == "1/8 3/8 5/8 7/8 1/5 1/6 1/7 1/9 1/10 1/3"
+
+def test_replace_unicode_fractions_mixed():
+    result = replace_unicode_fractions("1½ cups and 2¼ cups")
+    assert result == "1 1/2 cups and 2 1/4 cups"
+
+# image output policy
+def encode_test_image(image: Image.Image, format: str, **options) -> bytes:
+    buffered = io.BytesIO()
+    image.save(buffered, format=format, **options)
+    return buffered.getvalue()
+
+def test_process_image_webp():
+    image = encode_test_image(Image.new("RGB", (300, 200), (200, 100, 50)), "png")
+    mime, content = process_image("photo.png", image, format="webp")
+    assert mime == "image/webp"
+    assert Image.open(io.BytesIO(content)).format == "WEBP"
+    assert parse_image("photo.png", image, format="webp").startswith("data:image/webp;base64,")
+
+def test_process_image_progressive_jpeg():
+    image = encode_test_image(Image.new("RGBA", (300, 200), (200, 100, 50, 0)), "png")
+    mime, content = process_image("photo.png", image, format="jpeg")
+    result = Image.open(io.BytesIO(content))
+    assert mime == "image/jpeg"
+    assert result.info.get("progressive")
+    assert result.getpixel((0, 0)) == (255, 255, 255)
+
+def test_process_image_exif_orientation():
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    image = encode_test_image(Image.new("RGB", (300, 200), (200, 100, 50)), "jpeg", exif=exif)
+    for format in ["original", "jpeg", "webp"]:
+        mime, content = process_image("photo.jpeg", image, format=format)
+        result = Image.open(io.BytesIO(content))
+        assert result.size == (200, 300)
+        assert not result.getexif()
+
+def test_process_image_max_bytes():
+    noise = Image.merge("RGB", [Image.effect_noise((800, 800), 80)] * 3)
+    image = encode_test_image(noise, "jpeg", quality=95)
+    for format in ["jpeg", "webp", "original"]:
+        mime, content = process_image("photo.jpeg", image, format=format, max_bytes=40000)
+        assert len(content) <= 40000
+
+    mime, content = process_image("photo.jpeg", image, format="jpeg", max_bytes=10 * len(image))
+    assert Image.open(io.BytesIO(content)).size == (800, 800)